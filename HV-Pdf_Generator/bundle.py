@@ -0,0 +1,159 @@
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+
+import streamlit as st
+
+CHUNK_SIZE = 256 * 1024
+
+# Prepared ZIPs live in their own directory so abandoned ones can be swept
+BUNDLE_DIR = os.environ.get("BUNDLE_DIR", os.path.join(tempfile.gettempdir(), "hv_bundles"))
+BUNDLE_MAX_AGE = int(os.environ.get("BUNDLE_MAX_AGE", 3600))  # seconds
+
+# Already-compressed formats are stored as-is instead of being deflated again
+STORED_EXTENSIONS = {".pdf", ".docx", ".png", ".jpg", ".jpeg", ".webp", ".zip"}
+
+# ========== STREAMING ZIP WRITER ==========
+
+class _ChunkSink:
+    """Write-only, non-seekable buffer that hands written bytes back as chunks."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _iter_source(source):
+    """Yield the bytes of a path, bytes object, file-like, or callable returning a file-like."""
+    if isinstance(source, (bytes, bytearray)):
+        for start in range(0, len(source), CHUNK_SIZE):
+            yield source[start:start + CHUNK_SIZE]
+        return
+
+    if callable(source):
+        source = source()
+    if isinstance(source, (str, os.PathLike)):
+        source = open(source, "rb")
+
+    with source as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_zip_stream(entries):
+    """Yield a ZIP archive of (arcname, source) entries chunk by chunk.
+
+    Each entry is read and written incrementally, so neither the inputs nor
+    the archive are ever held in memory as a whole.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for arcname, source in entries:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            stored = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+
+            with zf.open(info, "w", force_zip64=True) as dest:
+                for chunk in _iter_source(source):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+    yield sink.drain()
+
+def prune_bundles(max_age=BUNDLE_MAX_AGE):
+    """Delete prepared ZIPs older than max_age seconds, e.g. from sessions that never came back."""
+    if not os.path.isdir(BUNDLE_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(BUNDLE_DIR):
+        path = os.path.join(BUNDLE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue  # already removed by another session
+
+def write_bundle(entries):
+    """Stream a ZIP of the entries into a file under BUNDLE_DIR and return its path."""
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    prune_bundles()
+    with tempfile.NamedTemporaryFile(dir=BUNDLE_DIR, suffix=".zip", delete=False) as f:
+        for chunk in iter_zip_stream(entries):
+            f.write(chunk)
+    return f.name
+
+# ========== STREAMLIT ==========
+
+def session_bundle_entries():
+    """Collect the documents generated in this session as (arcname, source) entries."""
+    entries = []
+    for prefix in ("nda", "contract", "invoice"):
+        for kind in ("docx", "pdf"):
+            data = st.session_state.get(f"{prefix}_{kind}")
+            name = st.session_state.get(f"{prefix}_{kind}_name")
+            if data and name:
+                entries.append((name, data))
+
+    file_prefix = st.session_state.get("file_prefix", "Offer_Letter")
+    for key, ext in (("filled_word", ".docx"), ("filled_pdf", ".pdf")):
+        path = st.session_state.get(key)
+        if path and os.path.exists(path):
+            entries.append((f"{file_prefix}{ext}", path))
+    return entries
+
+def _source_signature(source):
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha1(source).hexdigest()
+    if isinstance(source, str) and os.path.exists(source):
+        stat = os.stat(source)
+        return (source, stat.st_mtime, stat.st_size)
+    return None  # streams are identified by their arcname
+
+def _entries_signature(entries):
+    return tuple((arcname, _source_signature(source)) for arcname, source in entries)
+
+def _discard_bundle(key):
+    """Remove the session's prepared ZIP for this key, if any."""
+    bundle = st.session_state.pop(f"{key}_bundle", None)
+    if bundle and os.path.exists(bundle[0]):
+        os.remove(bundle[0])
+
+def show_bundle_download(entries, key, file_name="documents.zip"):
+    """Build the ZIP only when asked, then offer it as a single download.
+
+    A prepared ZIP is dropped as soon as the entries change, so the button
+    never serves a stale archive; ZIPs a session leaves behind are pruned by
+    age on the next prepare. The download button itself reads the file into
+    memory, as st.download_button needs the whole payload.
+    """
+    signature = _entries_signature(entries)
+    bundle = st.session_state.get(f"{key}_bundle")
+    if bundle and bundle[1] != signature:
+        _discard_bundle(key)
+    if not entries:
+        return
+
+    if st.button(f"📦 Prepare ZIP ({len(entries)} files)", key=f"{key}_prepare"):
+        _discard_bundle(key)
+        st.session_state[f"{key}_bundle"] = (write_bundle(entries), signature)
+
+    path = st.session_state.get(f"{key}_bundle", (None,))[0]
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            st.download_button("📥 Download ZIP", data=f, file_name=file_name,
+                               mime="application/zip", key=f"{key}_download")
@@ -0,0 +1,197 @@
+"""Process-wide, in-memory replica of the Firestore document collection.
+
+A single snapshot listener keeps the replica current for every session, so
+listing, filtering and dropdowns never query Firestore. Where the listener
+can't start (e.g. against a local fake), or keeps stopping, a background
+thread polls the collection and applies whatever changed by `update_time`.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("document_replica")
+
+POLL_SECONDS = int(os.environ.get("REPLICA_POLL_SECONDS", 30))
+READY_TIMEOUT = 10  # seconds to wait, once, for the initial snapshot
+MAX_LISTENER_RESTARTS = 3  # then fall back to polling for good
+
+_lock = threading.Lock()
+# Polls read outside _lock, so they are serialized to apply in order
+_poll_lock = threading.Lock()
+_ready = threading.Event()
+_state = {"collection": None, "mode": None, "watch": None, "synced_at": None, "error": None, "waited": False,
+          "restarts": 0, "resync": False}
+
+# Indexes: id -> snapshot, plus sorted (key, id) lists by name and by creation date
+_by_id = {}
+_names = {}
+_by_name = []
+_by_date = []
+
+# ========== INDEX ==========
+
+def _name_key(snapshot):
+    return ((snapshot.to_dict() or {}).get("name") or "").lower()
+
+def _date_key(snapshot):
+    created = getattr(snapshot, "create_time", None)
+    return created.timestamp() if created else 0.0
+
+def _remove(doc_id):
+    old = _by_id.pop(doc_id, None)
+    if old is None:
+        return
+    for index, key in ((_by_name, _names.pop(doc_id)), (_by_date, _date_key(old))):
+        i = bisect.bisect_left(index, (key, doc_id))
+        if i < len(index) and index[i] == (key, doc_id):
+            del index[i]
+
+def _upsert(snapshot):
+    _remove(snapshot.id)
+    _by_id[snapshot.id] = snapshot
+    _names[snapshot.id] = _name_key(snapshot)
+    bisect.insort(_by_name, (_names[snapshot.id], snapshot.id))
+    bisect.insort(_by_date, (_date_key(snapshot), snapshot.id))
+
+def _synced():
+    _state["synced_at"] = time.time()
+    _ready.set()
+
+def _wait_for_initial_sync():
+    """Block for the first snapshot only once; after that, serve whatever is there."""
+    if _ready.is_set() or _state["waited"]:
+        return
+    if not _ready.wait(READY_TIMEOUT):
+        logger.warning("No initial snapshot after %ss; serving an empty replica", READY_TIMEOUT)
+    _state["waited"] = True
+
+# ========== SYNC ==========
+
+def _on_snapshot(collection_snapshot, changes, read_time):
+    """Listener callback: apply added, modified and removed documents."""
+    with _lock:
+        if _state["resync"]:
+            # A restarted listener replays every document as ADDED but misses
+            # deletions made while it was down
+            live = {snapshot.id for snapshot in collection_snapshot}
+            for doc_id in set(_by_id) - live:
+                _remove(doc_id)
+            _state["resync"] = False
+        for change in changes:
+            if change.type.name == "REMOVED":
+                _remove(change.document.id)
+            else:
+                _upsert(change.document)
+        _state["error"] = None
+        _synced()
+
+def _poll_once():
+    """Read the collection once and apply only the documents whose update_time moved."""
+    with _poll_lock:
+        snapshots = {snapshot.id: snapshot for snapshot in _state["collection"].stream()}
+        with _lock:
+            for doc_id in set(_by_id) - set(snapshots):
+                _remove(doc_id)
+            for doc_id, snapshot in snapshots.items():
+                current = _by_id.get(doc_id)
+                if current is None or current.update_time != snapshot.update_time:
+                    _upsert(snapshot)
+            _synced()
+
+def _poll_forever():
+    while True:
+        try:
+            _poll_once()
+            _state["error"] = None
+        except Exception as e:
+            _state["error"] = str(e)
+            logger.warning("Replica poll failed: %s", e)
+        time.sleep(POLL_SECONDS)
+
+def _start_polling():
+    _state["mode"] = "polling"
+    _state["watch"] = None
+    threading.Thread(target=_poll_forever, name="document-replica", daemon=True).start()
+
+def start_replica(collection):
+    """Start mirroring a collection; later calls in the same process are no-ops."""
+    with _lock:
+        if _state["mode"] is not None:
+            return
+        _state["collection"] = collection
+        try:
+            _state["watch"] = collection.on_snapshot(_on_snapshot)
+            _state["mode"] = "listening"
+        except Exception as e:
+            logger.warning("Snapshot listener unavailable, polling every %ss instead: %s", POLL_SECONDS, e)
+            _start_polling()
+
+def _check_listener():
+    """Restart a listener that has stopped, or switch to polling once restarts are used up."""
+    watch = _state["watch"]
+    if _state["mode"] != "listening" or watch is None or getattr(watch, "is_active", True):
+        return
+    with _lock:
+        if _state["watch"] is not watch:
+            return  # another session already handled it
+        _state["error"] = "Snapshot listener stopped"
+        try:
+            watch.unsubscribe()
+        except Exception:
+            pass
+        if _state["restarts"] < MAX_LISTENER_RESTARTS:
+            _state["restarts"] += 1
+            try:
+                _state["resync"] = True
+                _state["watch"] = _state["collection"].on_snapshot(_on_snapshot)
+                logger.warning("Snapshot listener stopped; restarted it (%s/%s)",
+                               _state["restarts"], MAX_LISTENER_RESTARTS)
+                return
+            except Exception as e:
+                _state["error"] = f"Snapshot listener stopped: {e}"
+        logger.warning("Snapshot listener stopped; polling every %ss instead", POLL_SECONDS)
+        _state["resync"] = False
+        _start_polling()
+
+def sync_replica():
+    """Apply recent writes now when polling; the listener already delivers them."""
+    if _state["mode"] == "polling":
+        try:
+            _poll_once()
+        except Exception as e:
+            logger.warning("Replica sync failed: %s", e)
+
+# ========== QUERIES ==========
+
+def list_documents(order="name", query=None):
+    """Return document snapshots sorted by `name` or by `date` (newest first).
+
+    `query` keeps only documents whose name contains it, case-insensitively.
+    """
+    _check_listener()
+    _wait_for_initial_sync()
+    query = (query or "").strip().lower()
+    with _lock:
+        if order == "date":
+            return [_by_id[doc_id] for _, doc_id in reversed(_by_date)
+                    if not query or query in _names[doc_id]]
+        return [_by_id[doc_id] for name, doc_id in _by_name if not query or query in name]
+
+def get_document(doc_id):
+    """Return one document snapshot, or None if it isn't in the replica."""
+    _check_listener()
+    _wait_for_initial_sync()
+    with _lock:
+        return _by_id.get(doc_id)
+
+def replica_status():
+    """Current replica state, for display and logging."""
+    with _lock:
+        return {
+            "mode": _state["mode"],
+            "documents": len(_by_id),
+            "synced_at": _state["synced_at"],
+            "error": _state["error"],
+        }
@@ -0,0 +1,72 @@
+import logging
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import PartFactory, XmlPart
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+logger = logging.getLogger("docx_utils")
+
+# python-docx loads footnotes/endnotes as opaque blobs; load them as XML so
+# edits made through the traversal below are saved with the document.
+PartFactory.part_type_for.setdefault(CT.WML_FOOTNOTES, XmlPart)
+PartFactory.part_type_for.setdefault(CT.WML_ENDNOTES, XmlPart)
+
+STORY_RELATIONSHIPS = (RT.HEADER, RT.FOOTER, RT.FOOTNOTES, RT.ENDNOTES)
+
+TOKEN_START = "<<"
+
+# ========== STORY PARTS ==========
+
+class _StoryParent:
+    """Minimal parent so paragraphs outside the body still resolve their part (for images)."""
+
+    def __init__(self, part):
+        self.part = part
+
+def iter_story_parts(doc):
+    """Yield (part, root element) for the body and every header, footer, footnote and endnote part."""
+    yield doc.part, doc.element.body
+
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in STORY_RELATIONSHIPS:
+            continue
+        part = rel.target_part
+        if id(part) in seen:
+            continue
+        seen.add(id(part))
+
+        element = getattr(part, "element", None)
+        if element is None:
+            logger.debug(f"Skipping non-XML story part {part.partname}")
+            continue
+        yield part, element
+
+# ========== PARAGRAPH TRAVERSAL ==========
+
+def iter_paragraphs(doc):
+    """Yield every paragraph in the document in a single pass.
+
+    Covers body text, tables (including nested tables), text boxes, headers,
+    footers, footnotes and endnotes.
+    """
+    for part, root in iter_story_parts(doc):
+        parent = _StoryParent(part)
+        # Materialize first: callers add and remove runs while iterating
+        for p in list(root.iter(qn("w:p"))):
+            yield Paragraph(p, parent)
+
+def iter_placeholder_paragraphs(doc):
+    """Yield only the paragraphs whose text contains a `<<` placeholder marker."""
+    for para in iter_paragraphs(doc):
+        if TOKEN_START in para.text:
+            yield para
+
+def is_in_table(para):
+    """Return True if the paragraph sits inside a table cell."""
+    element = para._p.getparent()
+    while element is not None:
+        if element.tag == qn("w:tc"):
+            return True
+        element = element.getparent()
+    return False
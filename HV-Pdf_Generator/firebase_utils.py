@@ -1,62 +1,497 @@
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
 import streamlit as st
+from google.api_core import exceptions as api_exceptions
 from google.cloud import firestore
 from firebase_config import initialize_firebase
+from bundle import show_bundle_download
+from document_replica import get_document, list_documents, replica_status, start_replica, sync_replica
+from profiling import profile_request, stage
+from search_index import index_pdf, index_pdf_async, indexed_ids, remove_from_index, search
+from signed_urls import forget_signed_urls, signed_url, signed_urls
+from thumbnails import generate_thumbnail_async, get_thumbnail
+
+THUMBNAILS_PER_PAGE = 12
+GRID_COLUMNS = 4
+
+COLLECTION = "ProposalPDFPage2"
+BATCH_LIMIT = 500  # Firestore's maximum writes per batch
+STORAGE_WORKERS = 8
+RETRIES = 3
+# Only these are worth retrying; NotFound, PermissionDenied etc. fail at once
+TRANSIENT_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.InternalServerError,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
 
 bucket, db = initialize_firebase()
+# One listener per process keeps every session's listings current
+start_replica(db.collection(COLLECTION))
 
 def upload_to_firebase(uploaded_file, name):
     """Upload file to Firebase Storage and store details in Firestore."""
     blob = bucket.blob(f"uploaded_docs/{uploaded_file.name}")
-    blob.upload_from_file(uploaded_file, content_type=uploaded_file.type)
-    blob.make_public()
-
-    link = blob.public_url
-    # Store the document details (name and link) in Firestore
-    db.collection("ProposalPDFPage2").document().set({
-        "name": name,
-        "link": link
-    })
+    # Captured only when profiling is switched on
+    with profile_request("upload", {"name": name, "file": uploaded_file.name, "size": uploaded_file.size}):
+        with stage("storage"):
+            blob.upload_from_file(uploaded_file, content_type=uploaded_file.type)
+
+        # Thumbnail is rendered in the background; only its content hash is stored
+        digest = generate_thumbnail_async(uploaded_file)
+        # The object stays private; links are signed on demand from its path
+        with stage("firestore"):
+            ref = db.collection("ProposalPDFPage2").document()
+            ref.set({
+                "name": name,
+                "path": blob.name,
+                "hash": digest
+            })
+        index_pdf_async(uploaded_file, doc_type="Uploaded", name=name, link=blob.name, doc_id=ref.id)
+    sync_replica()
     st.success("File uploaded successfully!")
-    st.markdown(f"[Click to View]({link})")
+    st.markdown(f"[Click to View]({signed_url(bucket, blob.name)})")
+
+
+def resolve_link(link):
+    """Turn a stored link into a viewable URL; Storage paths get a signed link."""
+    if not link or link.startswith(("http://", "https://")):
+        return link
+    return signed_url(bucket, link)
+
+
+def document_blob_name(doc_data, bucket=None):
+    """Return the Storage object behind a document: its `path`, or the one in a legacy public link."""
+    if doc_data.get("path"):
+        return doc_data["path"]
+    link = doc_data.get("link", "")
+    return blob_name_from_link(link, bucket) if link else None
+
+
+def show_search(key):
+    """Full-text search over indexed PDFs, served from the local index."""
+    query = st.text_input("Search documents", key=f"{key}_search", placeholder="Client name, project, clause...")
+    if not query:
+        return
+
+    # A new query starts again from the first page
+    if st.session_state.get(f"{key}_search_query") != query:
+        st.session_state[f"{key}_search_query"] = query
+        st.session_state[f"{key}_search_page"] = 1
+    page = st.session_state[f"{key}_search_page"]
+    results, total = search(query, page=page)
+    if not total:
+        st.info("No matching documents.")
+        return
+
+    pages = (total + 9) // 10
+    st.caption(f"{total} result(s), page {page} of {pages}")
+    for result in results:
+        thumbnail = get_thumbnail(result["hash"])
+        if thumbnail:
+            st.image(thumbnail, width=80)
+        st.markdown(f"**{result['name']}** · {result['doc_type']} · {result['client'] or '-'} · {result['date']}")
+        # Snippets keep the PDF's line breaks, which would end the quote block
+        st.markdown(f"> {' '.join(result['snippet'].split())}")
+        if result["link"]:
+            st.markdown(f"🔗 [Click to View Document]({resolve_link(result['link'])})")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if page > 1 and st.button("Previous results", key=f"{key}_prev"):
+            st.session_state[f"{key}_search_page"] = page - 1
+            st.rerun()
+    with col2:
+        if page < pages and st.button("More results", key=f"{key}_next"):
+            st.session_state[f"{key}_search_page"] = page + 1
+            st.rerun()
+
+
+def _replica_unavailable():
+    """Warn when the replica is not serving current data. Returns True if nothing has loaded yet."""
+    status = replica_status()
+    detail = f": {status['error']}" if status["error"] else ""
+    if status["synced_at"] is None:
+        st.warning(f"Documents haven't loaded yet ({status['mode'] or 'not started'}{detail}). Refresh in a moment.")
+        return True
+    if status["error"]:
+        st.caption(f"⚠️ The document list may be out of date{detail}")
+    return False
 
 
 def show_documents():
-    """Fetch and display uploaded documents from Firestore."""
+    """Display uploaded documents from the in-memory replica."""
+    show_search("view")
+
     st.markdown("### Uploaded Documents")
-    # Fetch documents from Firestore
-    docs = list(db.collection("ProposalPDFPage2").stream())
+    # Listing, filtering and sorting never touch Firestore
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        name_filter = st.text_input("Filter by name", key="view_filter")
+    with col2:
+        order = st.selectbox("Sort by", ["date", "name"], key="view_order",
+                             format_func={"date": "Newest first", "name": "Name"}.get)
+    docs = list_documents(order=order, query=name_filter)
+    if _replica_unavailable():
+        return
+    if not docs:
+        st.info("No documents found.")
+        return
+
+    # Only the current page of thumbnails is loaded
+    pages = max(1, (len(docs) + THUMBNAILS_PER_PAGE - 1) // THUMBNAILS_PER_PAGE)
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+    start = (page - 1) * THUMBNAILS_PER_PAGE
 
-    # Loop through the documents and display their details
-    for idx, doc in enumerate(docs, 1):
-        doc_data = doc.to_dict()
+    # Sign every link on the page in one go; fresh links come from the cache
+    page_docs = [doc.to_dict() for doc in docs[start:start + THUMBNAILS_PER_PAGE]]
+    blob_names = [document_blob_name(doc_data) for doc_data in page_docs]
+    urls = signed_urls(bucket, [blob_name for blob_name in blob_names if blob_name])
+
+    # Display the documents as a grid of thumbnails with their links
+    cols = st.columns(GRID_COLUMNS)
+    for idx, (doc_data, blob_name) in enumerate(zip(page_docs, blob_names), start + 1):
         name = doc_data.get("name", "No Name")
-        link = doc_data.get("link", "").strip()
+        link = urls.get(blob_name) or doc_data.get("link", "").strip()
 
-        st.markdown(f"**{idx}. {name}**")
-        
-        # Display the link as a clickable link for all document types
-        if link:
-            st.markdown(f"🔗 [Click to View Document]({link})")
-        else:
-            st.warning("_No link available_")
+        with cols[(idx - 1) % GRID_COLUMNS]:
+            thumbnail = get_thumbnail(doc_data.get("hash"))
+            if thumbnail:
+                st.image(thumbnail, use_column_width=True)
+            else:
+                st.caption("📄 No preview")
 
+            st.markdown(f"**{idx}. {name}**")
 
-def update_document(doc_id, new_name, new_link):
-    db.collection("ProposalPDFPage2").document(doc_id).update({
-        "name": new_name,
-        "link": new_link.strip()
-    })
+            # Display the link as a clickable link for all document types
+            if link:
+                st.markdown(f"🔗 [Click to View Document]({link})")
+            else:
+                st.warning("_No link available_")
+
+
+def update_document(doc_id, new_name, new_link=None):
+    """Rename a document; `new_link` is only written for legacy link-only documents."""
+    fields = {"name": new_name}
+    if new_link is not None:
+        fields["link"] = new_link.strip()
+    db.collection("ProposalPDFPage2").document(doc_id).update(fields)
+    sync_replica()
     st.success("Document updated successfully!")
 
 
 def delete_document(doc_id):
     db.collection("ProposalPDFPage2").document(doc_id).delete()
+    remove_from_index([doc_id])
+    sync_replica()
     st.success("Document deleted successfully!")
 
 
+# ========== BULK OPERATIONS ==========
+# Every helper takes optional `db`/`bucket` arguments so it can run against
+# the Firestore/Storage emulators (FIRESTORE_EMULATOR_HOST,
+# STORAGE_EMULATOR_HOST) or in-memory fakes.
+
+def _with_retries(fn, *args):
+    """Call fn, retrying transient failures with exponential backoff."""
+    for attempt in range(RETRIES):
+        try:
+            return fn(*args)
+        except TRANSIENT_ERRORS:
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def _chunks(items, size=BATCH_LIMIT):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _commit(db, chunk):
+    batch = db.batch()
+    for op, ref, data in chunk:
+        if op == "delete":
+            batch.delete(ref)
+        elif op == "update":
+            batch.update(ref, data)
+        else:
+            batch.set(ref, data)
+    _with_retries(batch.commit)
+
+
+def _commit_in_batches(operations, db=None):
+    """Apply (op, ref, data) tuples through batched writes, chunked at the 500-op limit.
+
+    A batch rejected outright (e.g. an update to a deleted document) is
+    replayed one write at a time so only the bad writes are lost; a batch
+    that still fails transiently after retries is reported as failed as a
+    whole. Returns (applied, failed_ids).
+    """
+    db = db or globals()["db"]
+    applied, failed = 0, []
+    for chunk in _chunks(operations):
+        try:
+            _commit(db, chunk)
+            applied += len(chunk)
+            continue
+        except TRANSIENT_ERRORS:
+            failed.extend(ref.id for _, ref, _ in chunk)
+            continue
+        except api_exceptions.GoogleAPICallError:
+            pass
+        for operation in chunk:
+            try:
+                _commit(db, [operation])
+                applied += 1
+            except (api_exceptions.GoogleAPICallError, *TRANSIENT_ERRORS):
+                failed.append(operation[1].id)
+    return applied, failed
+
+
+def blob_name_from_link(link, bucket=None):
+    """Return the Storage object name behind a public link, or None if it isn't in our bucket."""
+    bucket = bucket or globals()["bucket"]
+    path = unquote(urlparse(link.strip()).path).lstrip("/")
+    prefix = f"{bucket.name}/"
+    return path[len(prefix):] if path.startswith(prefix) else None
+
+
+def _delete_blobs(blob_names, bucket=None):
+    """Delete Storage objects in parallel; returns the names that failed."""
+    bucket = bucket or globals()["bucket"]
+
+    def delete(name):
+        try:
+            _with_retries(bucket.blob(name).delete)
+            return None
+        except Exception:
+            return name
+
+    with ThreadPoolExecutor(max_workers=STORAGE_WORKERS) as pool:
+        return [name for name in pool.map(delete, blob_names) if name]
+
+
+def _referenced_blobs(blob_names, db=None):
+    """Return the blob names still referenced by a document's `path`.
+
+    Legacy link-only documents get their `path` from the re-link sweep.
+    """
+    db = db or globals()["db"]
+    collection = db.collection(COLLECTION)
+    referenced = set()
+    # Firestore caps `in` filters at 30 values
+    for chunk in _chunks(sorted(blob_names), 30):
+        referenced.update(snap.to_dict().get("path") for snap in collection.where("path", "in", chunk).stream())
+    return referenced
+
+
+def bulk_delete_documents(doc_ids, delete_files=True, db=None, bucket=None):
+    """Delete many documents, then the files no remaining document uses.
+
+    Records go first, so a failed commit never leaves a record without its
+    file. Returns (deleted_ids, failed_ids, failed_files).
+    """
+    db = db or globals()["db"]
+    refs = [db.collection(COLLECTION).document(doc_id) for doc_id in doc_ids]
+
+    # One round-trip to read every path before the records are gone
+    blob_names = {}
+    if delete_files:
+        for snap in db.get_all(refs):
+            name = document_blob_name(snap.to_dict(), bucket) if snap.exists else None
+            if name:
+                blob_names[snap.id] = name
+
+    _, failed_ids = _commit_in_batches([("delete", ref, None) for ref in refs], db)
+    deleted_ids = [doc_id for doc_id in doc_ids if doc_id not in set(failed_ids)]
+    remove_from_index(deleted_ids)
+
+    failed_files = []
+    names = {blob_names[doc_id] for doc_id in deleted_ids if doc_id in blob_names}
+    if names:
+        # Uploads share `uploaded_docs/{filename}`, so keep files another document still points at
+        names -= _referenced_blobs(names, db)
+        failed_files = _delete_blobs(sorted(names), bucket)
+        forget_signed_urls(names)
+    return deleted_ids, failed_ids, failed_files
+
+
+def bulk_update_documents(updates, db=None):
+    """Apply {doc_id: {field: value}} updates through batched writes. Returns (updated, failed_ids)."""
+    db = db or globals()["db"]
+    operations = [("update", db.collection(COLLECTION).document(doc_id), fields)
+                  for doc_id, fields in updates.items()]
+    return _commit_in_batches(operations, db)
+
+
+def bulk_import_metadata(records, db=None):
+    """Create documents from dicts with at least `name` and `path` or `link` (an optional `id` is kept).
+
+    Returns (imported, failed_ids).
+    """
+    db = db or globals()["db"]
+    collection = db.collection(COLLECTION)
+    operations = []
+    for record in records:
+        record = {k: (v.strip() if isinstance(v, str) else v) for k, v in record.items() if v not in (None, "")}
+        doc_id = record.pop("id", None)
+        if not record.get("name"):
+            continue
+        ref = collection.document(doc_id) if doc_id else collection.document()
+        operations.append(("set", ref, record))
+    return _commit_in_batches(operations, db)
+
+
+def relink_sweep(db=None, bucket=None):
+    """Give every legacy document a `path` so its links can be signed.
+
+    Lists the bucket once and streams the collection once: one Firestore
+    read per document and no per-document Storage calls. Returns
+    (relinked, missing, external): missing documents point into our bucket
+    at a file that is gone, external ones link outside the bucket.
+    """
+    db = db or globals()["db"]
+    bucket = bucket or globals()["bucket"]
+    blob_names = {blob.name for blob in bucket.list_blobs(prefix="uploaded_docs/")}
+
+    updates, missing, external = {}, [], []
+    for snap in db.collection(COLLECTION).stream():
+        doc_data = snap.to_dict()
+        name = document_blob_name(doc_data, bucket)
+        if name is None and doc_data.get("link"):
+            external.append(snap.id)
+        elif name not in blob_names:
+            missing.append(snap.id)
+        elif doc_data.get("path") != name:
+            updates[snap.id] = {"path": name}
+
+    relinked, _ = bulk_update_documents(updates, db)
+    return relinked, missing, external
+
+
+def backfill_search_index(db=None, bucket=None, progress=None):
+    """Index stored documents that predate the search index, one download at a time.
+
+    Documents already indexed, or without a file in our bucket, are skipped.
+    `progress(done, total)` is called after each document. Returns (indexed, failed_ids).
+    """
+    db = db or globals()["db"]
+    bucket = bucket or globals()["bucket"]
+    known = indexed_ids()
+    pending = [(snap.id, snap.to_dict()) for snap in db.collection(COLLECTION).stream() if snap.id not in known]
+
+    indexed, failed = 0, []
+    for done, (doc_id, doc_data) in enumerate(pending, 1):
+        blob_name = document_blob_name(doc_data, bucket)
+        if blob_name:
+            try:
+                data = _with_retries(bucket.blob(blob_name).download_as_bytes)
+                index_pdf(data, doc_type="Uploaded", name=doc_data.get("name", doc_id),
+                          link=blob_name, doc_id=doc_id)
+                indexed += 1
+            except Exception:
+                failed.append(doc_id)
+        if progress:
+            progress(done, len(pending))
+    return indexed, failed
+
+
+def manage_bulk_documents(docs):
+    """Multi-select delete/tag, CSV metadata import and the re-link sweep."""
+    st.markdown("### Bulk Operations")
+    labels = {f"{doc.to_dict().get('name', 'Unnamed')} ({doc.id})": doc.id for doc in docs}
+    selected = [labels[label] for label in st.multiselect("Select documents", list(labels))]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        delete_files = st.checkbox("Also delete the stored files", value=True)
+        if st.button("Delete Selected", disabled=not selected):
+            try:
+                deleted, failed_ids, failed_files = bulk_delete_documents(selected, delete_files=delete_files)
+                st.success(f"Deleted {len(deleted)} document(s).")
+                if failed_ids:
+                    st.error(f"Could not delete {len(failed_ids)} document(s): {', '.join(failed_ids)}")
+                if failed_files:
+                    st.warning(f"Could not delete {len(failed_files)} file(s): {', '.join(failed_files)}")
+            except Exception as e:
+                st.error(f"Bulk delete failed: {e}")
+            sync_replica()
+    with col2:
+        tag = st.text_input("Tag")
+        if st.button("Tag Selected", disabled=not selected):
+            try:
+                count, failed = bulk_update_documents({doc_id: {"tag": tag.strip()} for doc_id in selected})
+                st.success(f"Updated {count} document(s).")
+                if failed:
+                    st.error(f"Could not update {len(failed)} document(s): {', '.join(failed)}")
+            except Exception as e:
+                st.error(f"Bulk tagging failed: {e}")
+            sync_replica()
+
+    # Files are streamed from Storage into the ZIP one chunk at a time
+    bundle_entries = []
+    for doc in docs:
+        data = doc.to_dict()
+        blob_name = document_blob_name(data) if doc.id in selected else None
+        if blob_name:
+            safe_name = ''.join(c if c.isalnum() or c in " -_" else '_' for c in data.get("name", doc.id))
+            bundle_entries.append((f"{safe_name}_{doc.id}.pdf", lambda name=blob_name: bucket.blob(name).open("rb")))
+    show_bundle_download(bundle_entries, key="firebase", file_name="documents.zip")
+
+    csv_file = st.file_uploader("Import metadata (CSV with name, path or link and optional id/tag columns)", type=["csv"])
+    if csv_file and st.button("Import"):
+        try:
+            records = list(csv.DictReader(io.StringIO(csv_file.getvalue().decode("utf-8-sig"))))
+            imported, failed = bulk_import_metadata(records)
+            st.success(f"Imported {imported} document(s).")
+            if failed:
+                st.error(f"Could not import {len(failed)} document(s): {', '.join(failed)}")
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+        sync_replica()
+
+    if st.button("Run Re-link Sweep"):
+        try:
+            relinked, missing, external = relink_sweep()
+            st.success(f"Re-linked {relinked} document(s).")
+            if missing:
+                st.warning(f"{len(missing)} document(s) point to missing files: {', '.join(missing)}")
+            if external:
+                st.info(f"{len(external)} document(s) link outside the bucket and were left as is: {', '.join(external)}")
+        except Exception as e:
+            st.error(f"Re-link sweep failed: {e}")
+        sync_replica()
+
+    # One-off: documents uploaded before the search index existed
+    if st.button("Index Existing Documents"):
+        bar = st.progress(0.0)
+        try:
+            indexed, failed = backfill_search_index(progress=lambda done, total: bar.progress(done / total))
+            st.success(f"Indexed {indexed} document(s).")
+            if failed:
+                st.error(f"Could not index {len(failed)} document(s): {', '.join(failed)}")
+        except Exception as e:
+            st.error(f"Indexing failed: {e}")
+
+
 def manage_documents():
     """Allow users to manage (update or delete) uploaded documents."""
-    docs = list(db.collection("ProposalPDFPage2").stream())
+    show_search("manage")
+
+    # The dropdown is filled from the in-memory replica, however large the collection
+    name_filter = st.text_input("Filter by name", key="manage_filter")
+    docs = list_documents(query=name_filter)
+    if _replica_unavailable():
+        return
 
     if not docs:
         st.info("No documents found.")
@@ -66,12 +501,23 @@ def manage_documents():
     doc_options = {f"{doc.to_dict().get('name', 'Unnamed')} ({doc.id})": doc.id for doc in docs}
     selected_label = st.selectbox("Select a document to update or delete", list(doc_options.keys()))
     selected_id = doc_options[selected_label]
-    selected_data = db.collection("ProposalPDFPage2").document(selected_id).get().to_dict()
+    snapshot = get_document(selected_id)
+    if snapshot is None:
+        # Removed since the list was drawn (e.g. by another session)
+        st.warning("This document no longer exists.")
+        manage_bulk_documents(docs)
+        return
+    selected_data = snapshot.to_dict()
 
     st.markdown("### Update Document")
     with st.form("update_form"):
         updated_name = st.text_input("Updated Name", selected_data.get("name", ""))
-        updated_link = st.text_input("Updated Link", selected_data.get("link", ""))
+        if selected_data.get("path"):
+            # Stored files are linked through signed URLs, so the path isn't editable
+            st.text_input("Storage Path", selected_data["path"], disabled=True)
+            updated_link = None
+        else:
+            updated_link = st.text_input("Updated Link", selected_data.get("link", ""))
         update_btn = st.form_submit_button("Update")
         if update_btn:
             update_document(selected_id, updated_name, updated_link)
@@ -79,3 +525,5 @@ def manage_documents():
     st.markdown("### Delete Document")
     if st.button("Delete This Document"):
         delete_document(selected_id)
+
+    manage_bulk_documents(docs)
@@ -0,0 +1,85 @@
+"""Locale-free money formatting shared by the generators.
+
+Everything here is a pure function (plus thread-safe memoization), so it is
+safe to call from worker threads and never touches the process locale.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from num2words import num2words
+
+# symbol, grouping, major unit, minor unit, num2words language
+CURRENCY_FORMATS = {
+    "INR": ("Rs.", "indian", "Rupees", "Paise", "en_IN"),
+    "USD": ("USD", "western", "US Dollars", "Cents", "en"),
+}
+
+# ========== GROUPING ==========
+
+def group_western(digits):
+    """1234567 -> 1,234,567"""
+    return f"{int(digits):,}"
+
+def group_indian(digits):
+    """1234567 -> 12,34,567 (lakh/crore grouping)."""
+    if len(digits) <= 3:
+        return digits
+    head, tail = digits[:-3], digits[-3:]
+    pairs = []
+    while len(head) > 2:
+        pairs.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        pairs.insert(0, head)
+    return ",".join(pairs + [tail])
+
+_GROUPERS = {"indian": group_indian, "western": group_western}
+
+# ========== AMOUNTS ==========
+
+def _split(amount):
+    """Split an amount into (sign, whole digits, two-digit fraction), rounding half up."""
+    value = Decimal(str(amount)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    sign = "-" if value < 0 else ""
+    whole, fraction = f"{abs(value):.2f}".split(".")
+    return sign, whole, fraction
+
+def format_number(amount, currency="INR", decimals=True):
+    """Group digits for the currency.
+
+    `decimals` True always shows paise/cents, False never, None only when non-zero.
+    """
+    grouping = _GROUPERS[CURRENCY_FORMATS[currency][1]]
+    sign, whole, fraction = _split(amount)
+    number = f"{sign}{grouping(whole)}"
+    if decimals or (decimals is None and fraction != "00"):
+        number += f".{fraction}"
+    return number
+
+def format_amount(amount, currency="INR", symbol=None, decimals=True):
+    """Format money with the currency's symbol and grouping, e.g. 'Rs. 12,34,567.00'.
+
+    `symbol` overrides the default prefix; a symbol without a trailing space
+    (like '₹') is attached directly to the number.
+    """
+    if symbol is None:
+        symbol = f"{CURRENCY_FORMATS[currency][0]} "
+    sign = "-" if amount < 0 else ""
+    return f"{sign}{symbol}{format_number(abs(amount), currency, decimals)}"
+
+# ========== WORDS ==========
+
+@lru_cache(maxsize=1024)
+def _words(number, lang):
+    return num2words(number, lang=lang).replace(",", "").replace("-", " ").title()
+
+def amount_to_words(amount, currency="INR"):
+    """Spell out an amount, e.g. 'Rupees One Lakh Twenty Three Thousand And Fifty Paise Only'."""
+    _, major_name, minor_name, lang = CURRENCY_FORMATS[currency][1:]
+    sign, whole, fraction = _split(amount)
+
+    words = f"{major_name} {_words(int(whole), lang)}"
+    if fraction != "00":
+        words += f" And {_words(int(fraction), lang)} {minor_name}"
+    prefix = "Minus " if sign else ""
+    return f"{prefix}{words} Only"
@@ -1,43 +1,26 @@
 import streamlit as st
 from datetime import datetime
 import os
-from docx import Document
 
+from incremental_render import save_incremental, reuse_pdf, remember_pdf
 from pdf_utils import convert_to_pdf
+from profiling import profile_request, stage
+from search_index import index_pdf_async
 from session_manager import clear_session_keys
+from template_lint import validate_placeholders, show_lint_warnings
+from thumbnails import generate_thumbnail_async
 
 # ========== Helper Functions ==========
 
-def replace_placeholders(doc, placeholders):
-    """Replace placeholders in paragraphs and tables."""
-    for para in doc.paragraphs:
-        for key, value in placeholders.items():
-            if key in para.text:
-                for run in para.runs:
-                    if key in run.text:
-                        run.text = run.text.replace(key, value)
-                        if key == "<<EndDate>>":
-                            run.bold = True  # Bold specific keys
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    for run in para.runs:
-                        for key, value in placeholders.items():
-                            if key in run.text:
-                                run.text = run.text.replace(key, value)
-                                if key == "<<EndDate>>":
-                                    run.bold = True
-    return doc
-
-def edit_contract_template(template_path, output_path, placeholders):
-    """Edit contract template and save filled version."""
-    doc = Document(template_path)
-    replace_placeholders(doc, placeholders)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc.save(output_path)
-    return output_path
+def replace_in_paragraphs(paragraphs, placeholders):
+    """Replace placeholders run by run in the given paragraphs."""
+    for para in paragraphs:
+        for run in para.runs:
+            for key, value in placeholders.items():
+                if key in run.text:
+                    run.text = run.text.replace(key, value)
+                    if key == "<<EndDate>>":
+                        run.bold = True  # Bold specific keys
 
 # ========== Main Generator Function ==========
 
@@ -73,32 +56,43 @@ def generate_contract():
                 st.error(f"Template file not found: {template_path}")
                 return
 
-            safe_name = ''.join(c if c.isalnum() else '_' for c in client_name)
-
-            docx_output_path = os.path.join(output_dir, f"Contract_{safe_name}.docx")
-            pdf_output_path = os.path.join(output_dir, f"Contract_{safe_name}.pdf")
-
-            # Generate DOCX
-            edit_contract_template(template_path, docx_output_path, placeholders)
-
-            # Save DOCX to session
-            with open(docx_output_path, "rb") as docx_file:
-                st.session_state.contract_docx = docx_file.read()
-                st.session_state.contract_docx_name = f"Contract_{safe_name}.docx"
-
-            # Convert to PDF
-            try:
-                convert_to_pdf(docx_output_path, pdf_output_path)
-
-                if os.path.exists(pdf_output_path):
-                    with open(pdf_output_path, "rb") as pdf_file:
-                        st.session_state.contract_pdf = pdf_file.read()
-                        st.session_state.contract_pdf_name = f"Contract_{safe_name}.pdf"
-                else:
-                    st.warning("PDF not found after conversion.")
-            except Exception as pdf_err:
-                st.error(f"PDF Conversion Error: {pdf_err}")
-                st.warning("PDF conversion failed, but DOCX is available.")
+            # Captured only when profiling is switched on
+            with profile_request("contract", placeholders):
+                show_lint_warnings(validate_placeholders(template_path, placeholders))
+
+                safe_name = ''.join(c if c.isalnum() else '_' for c in client_name)
+
+                docx_output_path = os.path.join(output_dir, f"Contract_{safe_name}.docx")
+                pdf_output_path = os.path.join(output_dir, f"Contract_{safe_name}.pdf")
+
+                # Generate DOCX, re-filling only the fields changed since the last run
+                with stage("fill"):
+                    changed = save_incremental("contract", template_path, placeholders, replace_in_paragraphs, docx_output_path)
+
+                # Save DOCX to session
+                with open(docx_output_path, "rb") as docx_file:
+                    st.session_state.contract_docx = docx_file.read()
+                    st.session_state.contract_docx_name = f"Contract_{safe_name}.docx"
+
+                # Convert to PDF
+                try:
+                    # Reuse the previous PDF when no field changed
+                    if changed or not reuse_pdf("contract", pdf_output_path):
+                        with stage("convert"):
+                            convert_to_pdf(docx_output_path, pdf_output_path)
+                        remember_pdf("contract", pdf_output_path)
+
+                    if os.path.exists(pdf_output_path):
+                        with open(pdf_output_path, "rb") as pdf_file:
+                            st.session_state.contract_pdf = pdf_file.read()
+                            st.session_state.contract_pdf_name = f"Contract_{safe_name}.pdf"
+                        index_pdf_async(pdf_output_path, doc_type="Contract", name=st.session_state.contract_pdf_name, client=client_name)
+                        generate_thumbnail_async(pdf_output_path)
+                    else:
+                        st.warning("PDF not found after conversion.")
+                except Exception as pdf_err:
+                    st.error(f"PDF Conversion Error: {pdf_err}")
+                    st.warning("PDF conversion failed, but DOCX is available.")
 
             # Download buttons
             col1, col2 = st.columns(2)
@@ -2,16 +2,18 @@ import streamlit as st
 import os
 import tempfile
 import uuid
-from docx import Document
-import fitz  # PyMuPDF
-from PIL import Image
-import locale
 import subprocess
 import platform
 
-
-# Set locale for number formatting
-locale.setlocale(locale.LC_ALL, '')
+from formatting import format_amount
+from pdf_utils import normalize_pdf
+from profiling import profile_request, stage
+from incremental_render import save_incremental, reuse_pdf, remember_pdf
+from render_service import iter_rendered_pages, page_count
+from resource_governor import admit, GovernorBusy
+from search_index import index_pdf_async
+from template_lint import validate_placeholders, show_lint_warnings
+from thumbnails import generate_thumbnail_async
 
 # ---- Function to Replace Placeholders in Word Document ----
 def replace_text_in_paragraph(paragraph, placeholders):
@@ -32,39 +34,20 @@ def replace_text_in_paragraph(paragraph, placeholders):
     if paragraph.runs:
         paragraph.runs[0].text = full_text
 
-def replace_text_in_table(table, placeholders):
-    """Replace placeholders inside all cells of a table."""
-    for row in table.rows:
-        for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                replace_text_in_paragraph(paragraph, placeholders)
-
-def edit_hiring_template(template_path, output_path, placeholders):
-    """Edit hiring contract template and save filled version."""
-    doc = Document(template_path)
-
-    for para in doc.paragraphs:
+def replace_in_paragraphs(paragraphs, placeholders):
+    """Apply replace_text_in_paragraph to each paragraph."""
+    for para in paragraphs:
         replace_text_in_paragraph(para, placeholders)
 
-    for table in doc.tables:
-        replace_text_in_table(table, placeholders)
-
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc.save(output_path)
-    return output_path
-
 # ---- Format price with commas ----
 def format_price_with_commas(price_str):
-    """Format price string with commas for thousands."""
+    """Format price string with Indian digit grouping, e.g. '₹1,50,000' or '₹15,000.50'."""
     try:
         # Remove any existing commas and spaces
-        price_str = price_str.replace(',', '').replace(' ', '')
-        # Convert to float then back to string with commas
-        price_float = float(price_str)
-        # Format with comma as thousand separator
-        return f"₹{price_float:,.2f}".rstrip('0').rstrip('.') if '.' in f"{price_float:,.2f}" else f"₹{price_float:,.0f}"
-    except ValueError:
-        # If conversion fails, return original string
+        price_float = float(price_str.replace(',', '').replace(' ', ''))
+        return format_amount(price_float, "INR", symbol="₹", decimals=None)
+    except (ValueError, ArithmeticError):
+        # Not a number, or "inf"/"nan" (which Decimal can't quantize): return original string
         return price_str
 
 # ---- Function to Convert Word to PDF using alternative methods ----
@@ -74,6 +57,17 @@ import platform
 import streamlit as st
 
 def convert_word_to_pdf(word_path, pdf_path):
+    try:
+        with admit("convert"), stage("libreoffice"):
+            converted = _convert_word_to_pdf(word_path, pdf_path)
+        if converted:
+            normalize_pdf(pdf_path)
+        return converted
+    except GovernorBusy as e:
+        st.error(str(e))
+        return False
+
+def _convert_word_to_pdf(word_path, pdf_path):
     try:
         # First, try LibreOffice (best option)
         if platform.system() == "Windows":
@@ -126,18 +120,17 @@ def convert_word_to_pdf(word_path, pdf_path):
         return False
 
 
-# ---- Function to Render PDF Page ----
-def render_pdf_page(pdf_path):
+# ---- Function to Render PDF Pages ----
+def show_pdf_preview(pdf_path, dpi=150):
+    """Render every page in parallel and show each one as soon as it is ready."""
     try:
-        doc = fitz.open(pdf_path)
-        page = doc[0]  # First page
-        pix = page.get_pixmap(dpi=300)  # Higher resolution
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        doc.close()
-        return img
+        slots = [st.empty() for _ in range(page_count(pdf_path))]
+        for page_no, image in iter_rendered_pages(pdf_path, dpi=dpi, fmt="WEBP"):
+            slots[page_no].image(image, caption=f"Page {page_no + 1}", use_column_width=True)
+        return True
     except Exception as e:
         st.error(f"Error rendering PDF: {e}")
-        return None
+        return False
 
 # ---- Navigation Functions ----
 def next_page():
@@ -211,15 +204,26 @@ def generate_hiring():
                 filled_word = os.path.join(temp_dir, f"{sanitized_file_prefix}.docx")
                 filled_pdf = os.path.join(temp_dir, f"{sanitized_file_prefix}.pdf")
                 
-                # Generate Word document
-                with st.spinner("Generating your document..."):
-                    word_success = edit_hiring_template(template_word, filled_word, replacements)
-                    
-                    # Convert to PDF if Word was successful
-                    if word_success:
-                        pdf_success = convert_word_to_pdf(filled_word, filled_pdf)
-                    else:
-                        pdf_success = False
+                # Captured only when profiling is switched on
+                with profile_request("hiring", replacements):
+                    # Catch missing or misspelled placeholders before the slow conversion
+                    if os.path.exists(template_word):
+                        show_lint_warnings(validate_placeholders(template_word, replacements, check_split=False))
+
+                    # Generate Word document
+                    with st.spinner("Generating your document..."):
+                        # Only the fields changed since the last run are re-filled
+                        with stage("fill"):
+                            changed = save_incremental("hiring", template_word, replacements, replace_in_paragraphs, filled_word)
+                        word_success = True
+
+                        # Reuse the previous PDF when no field changed
+                        pdf_success = not changed and reuse_pdf("hiring", filled_pdf)
+                        if not pdf_success:
+                            with stage("convert"):
+                                pdf_success = convert_word_to_pdf(filled_word, filled_pdf)
+                            if pdf_success:
+                                remember_pdf("hiring", filled_pdf)
                 
                 # Store paths and info in session state
                 if word_success:
@@ -230,6 +234,8 @@ def generate_hiring():
                     
                     if pdf_success:
                         st.session_state.filled_pdf = filled_pdf
+                        index_pdf_async(filled_pdf, doc_type="Hiring Contract", name=f"{file_prefix}.pdf", client=name)
+                        generate_thumbnail_async(filled_pdf)
                     
                     st.success("Document generated successfully!")
                     next_page()
@@ -250,11 +256,10 @@ def generate_hiring():
             preview_container = st.container()
             with preview_container:
                 if "filled_pdf" in st.session_state:
-                    # Show PDF preview
-                    pdf_image = render_pdf_page(st.session_state.filled_pdf)
-                    if pdf_image:
-                        st.image(pdf_image, use_column_width=True)
-                    else:
+                    # Show PDF preview, all pages
+                    with profile_request("hiring_preview", {"pdf": st.session_state.filled_pdf}), stage("preview"):
+                        previewed = show_pdf_preview(st.session_state.filled_pdf)
+                    if not previewed:
                         st.warning("Couldn't preview the PDF document.")
                 else:
                     st.info("PDF preview not available, but Word document has been generated.")
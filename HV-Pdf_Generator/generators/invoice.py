@@ -1,57 +1,95 @@
 import streamlit as st
 from datetime import datetime
 import os
-from docx import Document
-from num2words import num2words
+from copy import deepcopy
+from docx.table import _Row
 
+from formatting import format_amount, amount_to_words
+from incremental_render import save_incremental, reuse_pdf, remember_pdf
 from pdf_utils import convert_to_pdf
+from profiling import profile_request, stage
+from search_index import index_pdf_async
 from session_manager import clear_session_keys
+from template_lint import validate_placeholders, show_lint_warnings
+from thumbnails import generate_thumbnail_async
+
+INVOICE_TEMPLATE = "Invoice Template.docx"
+GST_RATE = 0.18
+
+# Per-currency display settings; adding a currency only needs a new entry here.
+CURRENCIES = {
+    "INR": {"label": "INR", "symbol": "Rs.", "phone_prefix": "+91- "},
+    "USD": {"label": "USD $", "symbol": "USD", "phone_prefix": ""},
+}
+
+# Default installment splits as (percentage, schedule description) pairs.
+INSTALLMENT_PRESETS = {
+    "1 Payment": [
+        (100, "The client needs to pay {pct}% of the total amount before starting the project."),
+    ],
+    "3 EMI": [
+        (30, "Before starting the project, the client needs to pay {pct}% of the total amount as advance."),
+        (40, "On 50% project completion, the next {pct}% payment needs to be released. (After getting UI UX Designs Approved)"),
+        (30, "Once the project gets completed, the client needs to pay the rest {pct}% of the total amount before getting the handover."),
+    ],
+    "5 EMI": [
+        (20, "Before starting the project, the client needs to pay {pct}% of the total amount as advance."),
+        (20, "On 25% project completion, the next {pct}% payment needs to be released."),
+        (20, "On 50% project completion, the next {pct}% payment needs to be released."),
+        (20, "On 75% project completion, the next {pct}% payment needs to be released."),
+        (20, "Once the project gets completed, the client needs to pay the rest {pct}% of the total amount before getting the handover."),
+    ],
+}
+
+CUSTOM_DESCRIPTION = "Installment {no}: the client needs to pay {pct}% of the total amount."
+
+# Filled per cloned schedule row rather than from the placeholder dict
+INSTALLMENT_KEYS = ("<<Installment No>>", "<<Installment Description>>", "<<Installment Amount>>")
+
+BOLD_KEYS = ("<<Base Amount>>", "<<GST Amount>>", "<<Total>>", "<<Installment Amount>>", "<<Amt to word>>")
 
 # ========== Helper Functions ==========
 
 def format_price(amount, currency):
-    """Format price based on currency."""
-    formatted_price = f"{amount:,.2f}"
-    return f"{currency} {formatted_price}" if currency == "USD" else f"Rs. {formatted_price}"
+    """Format price based on currency (lakh/crore grouping for INR)."""
+    return format_amount(amount, currency, symbol=f"{CURRENCIES[currency]['symbol']} ")
 
-def amount_to_words(amount):
-    """Convert amount to words (English)."""
-    try:
-        words = num2words(amount, lang='en').replace(',', '').title()
-        return words
-    except Exception:
-        return f"[Error converting {amount}]"
-
-def replace_placeholders(doc, placeholders):
-    """Replace placeholders in paragraphs and tables."""
-    for para in doc.paragraphs:
-        for key, value in placeholders.items():
-            if key in para.text:
-                for run in para.runs:
-                    if key in run.text:
-                        run.text = run.text.replace(key, value)
-                        if key.startswith("<<Price") or key.startswith("<<Total") or key == "<<Amt to word>>":
-                            run.bold = True
+def split_installments(total_amount, percentages):
+    """Split the total into rounded installments; the last one absorbs rounding."""
+    amounts = [round(total_amount * pct / 100) for pct in percentages[:-1]]
+    amounts.append(total_amount - sum(amounts))
+    return amounts
 
+def replace_in_runs(paragraphs, placeholders):
+    """Replace placeholders run by run, bolding the money fields."""
+    for para in paragraphs:
+        for run in para.runs:
+            for key, value in placeholders.items():
+                if key in run.text:
+                    run.text = run.text.replace(key, value)
+                    if key in BOLD_KEYS:
+                        run.bold = True
+
+def fill_installment_rows(doc, installments, currency):
+    """Clone the schedule row once per installment and fill it in."""
     for table in doc.tables:
         for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    for run in para.runs:
-                        for key, value in placeholders.items():
-                            if key in run.text:
-                                run.text = run.text.replace(key, value)
-                                if key.startswith("<<Price") or key.startswith("<<Total") or key == "<<Amt to word>>":
-                                    run.bold = True
-    return doc
+            if not any("<<Installment Amount>>" in cell.text for cell in row.cells):
+                continue
 
-def edit_invoice_template(template_path, output_path, placeholders):
-    """Edit invoice template and save filled version."""
-    doc = Document(template_path)
-    replace_placeholders(doc, placeholders)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc.save(output_path)
-    return output_path
+            template_tr = row._tr
+            for no, (description, amount) in enumerate(installments, 1):
+                new_tr = deepcopy(template_tr)
+                template_tr.addprevious(new_tr)
+                for cell in _Row(new_tr, table).cells:
+                    replace_in_runs(cell.paragraphs, {
+                        "<<Installment No>>": str(no),
+                        "<<Installment Description>>": description,
+                        "<<Installment Amount>>": format_price(amount, currency),
+                    })
+            template_tr.getparent().remove(template_tr)
+            return doc
+    return doc
 
 def get_next_invoice_number():
     """Simple invoice number counter stored in file."""
@@ -74,11 +112,12 @@ def get_next_invoice_number():
 def generate_invoice():
     st.title("Invoice Generator")
 
-    region = st.selectbox("Select Region", ["INR", "USD"])
-    payment_options = ["1 Payment", "3 EMI", "5 EMI"] if region == "INR" else ["3 EMI", "5 EMI"]
+    region = st.selectbox("Select Region", list(CURRENCIES))
+    payment_options = list(INSTALLMENT_PRESETS) + ["Custom"]
 
     client_name = st.text_input("Client Name")
     client_address = st.text_input("Client Address")
+    client_email = st.text_input("Client Email")
     project_name = st.text_input("Project Name")
     phone_number = st.text_input("Phone Number")
     gst_number = st.text_input("GST Number")
@@ -86,108 +125,109 @@ def generate_invoice():
     payment_option = st.selectbox("Payment Option", payment_options)
     invoice_date = st.date_input("Invoice Date", value=datetime.today())
 
-    gst_amount = round(base_amount * 0.18)
+    gst_amount = round(base_amount * GST_RATE)
     total_amount = base_amount + gst_amount
 
+    # Build the installment schedule; percentages can be edited per installment
+    if payment_option == "Custom":
+        count = st.number_input("Number of Installments", min_value=1, max_value=12, value=4, step=1)
+        preset = [(100 // count, CUSTOM_DESCRIPTION)] * count
+        preset[-1] = (100 - (100 // count) * (count - 1), CUSTOM_DESCRIPTION)
+    else:
+        preset = INSTALLMENT_PRESETS[payment_option]
+
+    st.markdown("**Payment Schedule (%)**")
+    percentages = []
+    cols = st.columns(len(preset))
+    for no, (col, (pct, _)) in enumerate(zip(cols, preset), 1):
+        with col:
+            percentages.append(st.number_input(f"Installment {no}", min_value=0, max_value=100,
+                                               value=pct, step=1, key=f"invoice_pct_{payment_option}_{no}"))
+
+    amounts = split_installments(total_amount, percentages)
+    installments = [
+        (description.format(no=no, pct=pct), amount)
+        for no, ((_, description), pct, amount) in enumerate(zip(preset, percentages, amounts), 1)
+    ]
+
+    currency = CURRENCIES[region]
     placeholders = {
         "<<Client Name>>": client_name,
         "<<Client Address>>": client_address,
+        "<<Client Email>>": client_email,
         "<<GST Number>>": gst_number,
-        "<<Client Email>>": client_address,
         "<<Project Name>>": project_name,
-        "<<Mobile Number>>": phone_number,
+        "<<Mobile Number>>": f"{currency['phone_prefix']}{phone_number}",
         "<<Date>>": invoice_date.strftime("%d-%m-%Y"),
-        "<<Amt to word>>": amount_to_words(int(total_amount)),
+        "<<Currency Label>>": currency["label"],
+        "<<Base Amount>>": format_price(base_amount, region),
+        "<<GST Amount>>": format_price(gst_amount, region),
+        "<<Total>>": format_price(total_amount, region),
+        "<<Amt to word>>": amount_to_words(total_amount, region),
     }
 
-    # Select template based on payment option
-    if payment_option == "1 Payment":
-        template_name = f"Invoice Template - {region} - 1 Payment 1.docx"
-        placeholders.update({
-            "<<Price 1>>": format_price(base_amount, region),
-            "<<Price 2>>": format_price(gst_amount, region),
-            "<<Price 3>>": format_price(total_amount, region),
-            "<<Total 1>>": format_price(total_amount, region),
-        })
-    elif payment_option == "3 EMI":
-        template_name = f"Invoice Template - {region} - 3 EMI Payment Schedule 1.docx"
-        p1 = round(total_amount * 0.30)
-        p2 = round(total_amount * 0.40)
-        p3 = total_amount - (p1 + p2)
-        placeholders.update({
-            "<<Price 1>>": format_price(p1, region),
-            "<<Price 2>>": format_price(p2, region),
-            "<<Price 3>>": format_price(p3, region),
-            "<<Price 4>>": format_price(gst_amount, region),
-            "<<Price 5>>": format_price(total_amount, region),
-            "<<Price 6>>": format_price(p1, region),
-            "<<Price 7>>": format_price(p2, region),
-            "<<Price 8>>": format_price(p3, region),
-        })
-    elif payment_option == "5 EMI":
-        template_name = f"Invoice Template - {region} - 5 EMI Payment Schedule 1.docx"
-        p1 = round(total_amount * 0.20)
-        p2 = round(total_amount * 0.20)
-        p3 = round(total_amount * 0.20)
-        p4 = round(total_amount * 0.20)
-        p5 = total_amount - (p1 + p2 + p3 + p4)
-        placeholders.update({
-            "<<Price 1>>": format_price(p1, region),
-            "<<Price 2>>": format_price(p2, region),
-            "<<Price 3>>": format_price(p3, region),
-            "<<Price 4>>": format_price(p4, region),
-            "<<Price 5>>": format_price(p5, region),
-            "<<Price 6>>": format_price(p1, region),
-            "<<Price 7>>": format_price(p2, region),
-            "<<Price 8>>": format_price(p3, region),
-            "<<Price 9>>": format_price(p4, region),
-            "<<Price 10>>": format_price(p5, region),
-            "<<Total 1>>": format_price(total_amount, region),
-        })
-
     output_dir = os.path.join("app", "generated_files", "invoices")
     os.makedirs(output_dir, exist_ok=True)
 
     if st.button("Generate Invoice"):
         try:
+            if sum(percentages) != 100:
+                st.error(f"Installment percentages must add up to 100 (currently {sum(percentages)}).")
+                return
+
             clear_session_keys(["invoice_docx", "invoice_pdf", "invoice_docx_name", "invoice_pdf_name"])
 
             invoice_number = get_next_invoice_number()
-            placeholders["<<Invoice>>"] = str(invoice_number)
             placeholders["<<Invoice No>>"] = str(invoice_number)
 
-            template_path = os.path.join(os.getcwd(), template_name)
+            template_path = os.path.join(os.getcwd(), INVOICE_TEMPLATE)
 
             if not os.path.exists(template_path):
                 st.error(f"Template file not found: {template_path}")
                 return
 
-            safe_client_name = ''.join(c if c.isalnum() else '_' for c in client_name)
+            # Captured only when profiling is switched on
+            with profile_request("invoice", dict(placeholders, installments=installments, currency=region)):
+                show_lint_warnings(validate_placeholders(template_path, placeholders, extra_keys=INSTALLMENT_KEYS))
 
-            docx_output_path = os.path.join(output_dir, f"Invoice_{safe_client_name}_{invoice_number}.docx")
-            pdf_output_path = os.path.join(output_dir, f"Invoice_{safe_client_name}_{invoice_number}.pdf")
+                safe_client_name = ''.join(c if c.isalnum() else '_' for c in client_name)
 
-            # Generate DOCX
-            edit_invoice_template(template_path, docx_output_path, placeholders)
+                docx_output_path = os.path.join(output_dir, f"Invoice_{safe_client_name}_{invoice_number}.docx")
+                pdf_output_path = os.path.join(output_dir, f"Invoice_{safe_client_name}_{invoice_number}.pdf")
+
+                # Generate DOCX, re-filling only the fields changed since the last run;
+                # a different schedule or currency rebuilds the installment rows
+                with stage("fill"):
+                    changed = save_incremental(
+                        "invoice", template_path, placeholders, replace_in_runs, docx_output_path,
+                        prepare=lambda doc: fill_installment_rows(doc, installments, region),
+                        structure_key=(tuple(installments), region),
+                    )
 
-            # Save DOCX to session
-            with open(docx_output_path, "rb") as docx_file:
-                st.session_state.invoice_docx = docx_file.read()
-                st.session_state.invoice_docx_name = f"Invoice_{safe_client_name}_{invoice_number}.docx"
+                # Save DOCX to session
+                with open(docx_output_path, "rb") as docx_file:
+                    st.session_state.invoice_docx = docx_file.read()
+                    st.session_state.invoice_docx_name = f"Invoice_{safe_client_name}_{invoice_number}.docx"
 
-            # Convert to PDF
-            try:
-                convert_to_pdf(docx_output_path, pdf_output_path)
+                # Convert to PDF
+                try:
+                    # Reuse the previous PDF when no field changed
+                    if changed or not reuse_pdf("invoice", pdf_output_path):
+                        with stage("convert"):
+                            convert_to_pdf(docx_output_path, pdf_output_path)
+                        remember_pdf("invoice", pdf_output_path)
 
-                if os.path.exists(pdf_output_path):
-                    with open(pdf_output_path, "rb") as pdf_file:
-                        st.session_state.invoice_pdf = pdf_file.read()
-                        st.session_state.invoice_pdf_name = f"Invoice_{safe_client_name}_{invoice_number}.pdf"
-                else:
-                    st.warning("PDF not found after conversion.")
-            except Exception as pdf_err:
-                st.error(f"PDF Conversion Error: {pdf_err}")
-                st.warning("PDF conversion failed, but DOCX is available.")
+                    if os.path.exists(pdf_output_path):
+                        with open(pdf_output_path, "rb") as pdf_file:
+                            st.session_state.invoice_pdf = pdf_file.read()
+                            st.session_state.invoice_pdf_name = f"Invoice_{safe_client_name}_{invoice_number}.pdf"
+                        index_pdf_async(pdf_output_path, doc_type="Invoice", name=st.session_state.invoice_pdf_name, client=client_name)
+                        generate_thumbnail_async(pdf_output_path)
+                    else:
+                        st.warning("PDF not found after conversion.")
+                except Exception as pdf_err:
+                    st.error(f"PDF Conversion Error: {pdf_err}")
+                    st.warning("PDF conversion failed, but DOCX is available.")
 
             # Download buttons
             col1, col2 = st.columns(2)
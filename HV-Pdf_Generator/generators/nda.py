@@ -2,13 +2,19 @@ import streamlit as st
 import os
 import tempfile
 import uuid
-from docx import Document
 import fitz  # PyMuPDF
 from PIL import Image
 import locale
 import subprocess
 import platform
-import datetime
+from datetime import datetime
+
+from incremental_render import save_incremental, reuse_pdf, remember_pdf
+from pdf_utils import convert_to_pdf
+from profiling import profile_request, stage
+from search_index import index_pdf_async
+from template_lint import validate_placeholders, show_lint_warnings
+from thumbnails import generate_thumbnail_async
 def replace_text_in_paragraph(paragraph, placeholders):
     """Replace placeholders in a paragraph, preserving formatting and optionally bolding specific runs."""
     # Combine all run texts
@@ -35,31 +41,11 @@ def replace_text_in_paragraph(paragraph, placeholders):
             return
 
 
-def replace_text_in_table(table, placeholders):
-    """Iterate through table cells and replace placeholders."""
-    for row in table.rows:
-        for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                replace_text_in_paragraph(paragraph, placeholders)
-
-
-def edit_nda_template(template_path, output_path, placeholders):
-    """Load template, replace placeholders in body and tables, then save."""
-    doc = Document(template_path)
-
-    # Replace in document body
-    for paragraph in doc.paragraphs:
+def replace_in_paragraphs(paragraphs, placeholders):
+    """Apply replace_text_in_paragraph to each paragraph."""
+    for paragraph in paragraphs:
         replace_text_in_paragraph(paragraph, placeholders)
 
-    # Replace in all tables
-    for table in doc.tables:
-        replace_text_in_table(table, placeholders)
-
-    # Ensure target directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc.save(output_path)
-    return output_path
-
 
 def generate_nda():
     """Streamlit UI to collect inputs and generate the NDA document."""
@@ -96,39 +82,50 @@ def generate_nda():
                 st.error(f"Template file not found: {template_path}")
                 return
 
+            # Captured only when profiling is switched on
+            with profile_request("nda", placeholders):
+                show_lint_warnings(validate_placeholders(template_path, placeholders, check_split=False))
+
             
-            safe_name = ''.join(c if c.isalnum() else '_' for c in client_name)
+                safe_name = ''.join(c if c.isalnum() else '_' for c in client_name)
             
-            # Save the hiring contract to a temporary directory
-            temp_dir = tempfile.gettempdir()
-            docx_output_path = os.path.join(temp_dir, f"NDA_{safe_name}.docx")
-            pdf_output_path = os.path.join(temp_dir, f"NDA_{safe_name}.pdf")
-
-            # Edit the hiring template and save the contract
-            edit_nda_template(template_path, docx_output_path, placeholders)
-            # st.info("DOCX file created successfully. Converting to PDF...")
-
-            # Load the generated DOCX file into session state for download
-            with open(docx_output_path, "rb") as docx_file:
-                st.session_state.nda_docx = docx_file.read()
-                st.session_state.nda_docx_name = f"NDA_{safe_name}.docx"
-
-            # Convert DOCX to PDF with better error handling
-            try:
-                convert_to_pdf(docx_output_path, pdf_output_path)
-                # st.info(f"PDF conversion completed. Checking result...")
+                # Save the hiring contract to a temporary directory
+                temp_dir = tempfile.gettempdir()
+                docx_output_path = os.path.join(temp_dir, f"NDA_{safe_name}.docx")
+                pdf_output_path = os.path.join(temp_dir, f"NDA_{safe_name}.pdf")
+
+                # Edit the template and save, re-filling only the fields changed since the last run
+                with stage("fill"):
+                    changed = save_incremental("nda", template_path, placeholders, replace_in_paragraphs, docx_output_path)
+                # st.info("DOCX file created successfully. Converting to PDF...")
+
+                # Load the generated DOCX file into session state for download
+                with open(docx_output_path, "rb") as docx_file:
+                    st.session_state.nda_docx = docx_file.read()
+                    st.session_state.nda_docx_name = f"NDA_{safe_name}.docx"
+
+                # Convert DOCX to PDF with better error handling
+                try:
+                    # Reuse the previous PDF when no field changed
+                    if changed or not reuse_pdf("nda", pdf_output_path):
+                        with stage("convert"):
+                            convert_to_pdf(docx_output_path, pdf_output_path)
+                        remember_pdf("nda", pdf_output_path)
+                    # st.info(f"PDF conversion completed. Checking result...")
                 
-                if os.path.exists(pdf_output_path):
-                    with open(pdf_output_path, "rb") as pdf_file:
-                        st.session_state.nda_pdf = pdf_file.read()
-                        st.session_state.nda_pdf_name =f"NDA_{safe_name}.pdf"
-                    # st.success("PDF created successfully!")
-                else:
-                    st.warning("PDF file not found after conversion attempt.")
-            except Exception as pdf_err:
-                st.error(f"PDF Conversion Error: {pdf_err}")
-                # Still allow DOCX download even if PDF fails
-                st.warning("PDF conversion failed, but DOCX is available for download.")
+                    if os.path.exists(pdf_output_path):
+                        with open(pdf_output_path, "rb") as pdf_file:
+                            st.session_state.nda_pdf = pdf_file.read()
+                            st.session_state.nda_pdf_name =f"NDA_{safe_name}.pdf"
+                        index_pdf_async(pdf_output_path, doc_type="NDA", name=st.session_state.nda_pdf_name, client=client_name)
+                        generate_thumbnail_async(pdf_output_path)
+                        # st.success("PDF created successfully!")
+                    else:
+                        st.warning("PDF file not found after conversion attempt.")
+                except Exception as pdf_err:
+                    st.error(f"PDF Conversion Error: {pdf_err}")
+                    # Still allow DOCX download even if PDF fails
+                    st.warning("PDF conversion failed, but DOCX is available for download.")
 
             # Display download buttons based on what's available
             col1, col2 = st.columns(2)
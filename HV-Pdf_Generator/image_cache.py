@@ -0,0 +1,82 @@
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+logger = logging.getLogger("image_cache")
+
+TARGET_DPI = 200
+MAX_ENTRIES = 64
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+# ========== IMAGE LOADING ==========
+
+def read_image_bytes(image_file):
+    """Return the raw bytes of a path or file-like image (e.g. a Streamlit upload)."""
+    if hasattr(image_file, "read"):
+        if hasattr(image_file, "seek"):
+            image_file.seek(0)
+        data = image_file.read()
+        if hasattr(image_file, "seek"):
+            image_file.seek(0)
+        return data
+
+    with open(image_file, "rb") as f:
+        return f.read()
+
+def _downscale(data, width_in, height_in, dpi):
+    """Resize an image to fit the target box at the given DPI and recompress it."""
+    target = (max(1, int(width_in * dpi)), max(1, int(height_in * dpi)))
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        img.thumbnail(target, Image.LANCZOS)
+
+        out = io.BytesIO()
+        # Signatures and logos usually need transparency; photos don't
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(out, format="PNG", optimize=True, dpi=(dpi, dpi))
+        else:
+            img.convert("RGB").save(out, format="JPEG", quality=85, optimize=True, dpi=(dpi, dpi))
+        return out.getvalue()
+
+# ========== PRE-SCALED CACHE ==========
+
+def get_scaled_image(image_file, width_in, height_in, dpi=TARGET_DPI):
+    """Return a downscaled copy of the image, cached by content hash and target size.
+
+    Identical inputs always return identical bytes, so python-docx reuses the
+    same image part within a document and every document embeds the same
+    small image instead of the original upload.
+    """
+    data = read_image_bytes(image_file)
+    key = (hashlib.sha256(data).hexdigest(), width_in, height_in, dpi)
+
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return io.BytesIO(_cache[key])
+
+    try:
+        scaled = _downscale(data, width_in, height_in, dpi)
+    except Exception as e:
+        logger.warning(f"Could not downscale image, embedding original: {e}")
+        scaled = data
+
+    with _lock:
+        _cache[key] = scaled
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+    return io.BytesIO(scaled)
+
+def clear_image_cache():
+    """Drop all cached images."""
+    with _lock:
+        _cache.clear()
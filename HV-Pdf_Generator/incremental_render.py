@@ -0,0 +1,121 @@
+import os
+import time
+from copy import deepcopy
+
+import streamlit as st
+from docx import Document
+from docx.text.paragraph import Paragraph
+
+from docx_utils import iter_placeholder_paragraphs
+from template_lint import TOKEN_PATTERN
+
+# A job keeps the document, pristine paragraph copies and the PDF bytes in
+# session memory, so one left idle this long is dropped
+JOB_TTL = int(os.environ.get("INCREMENTAL_JOB_TTL", 900))  # seconds
+
+JOB_SUFFIX = "_last_job"
+
+# ========== SESSION STATE ==========
+
+def _state_key(kind):
+    return f"{kind}{JOB_SUFFIX}"
+
+def _get_job(kind):
+    job = st.session_state.get(_state_key(kind))
+    if job is not None:
+        job["used_at"] = time.time()
+    return job
+
+def evict_stale_jobs(max_age=JOB_TTL):
+    """Drop every cached job in this session that hasn't been used for max_age seconds."""
+    cutoff = time.time() - max_age
+    for key in [key for key in st.session_state if str(key).endswith(JOB_SUFFIX)]:
+        job = st.session_state.get(key)
+        if job is None or job.get("used_at", 0) < cutoff:
+            st.session_state.pop(key, None)
+
+def _fresh_job(template_path, placeholders, fill_paragraphs, prepare, structure_key):
+    """Fill a template from scratch, remembering the pristine XML of every placeholder paragraph."""
+    doc = Document(template_path)
+    if prepare:
+        prepare(doc)
+
+    paragraphs = list(iter_placeholder_paragraphs(doc))
+    token_index = {}
+    for i, para in enumerate(paragraphs):
+        for token in set(TOKEN_PATTERN.findall(para.text)):
+            token_index.setdefault(token, []).append(i)
+
+    job = {
+        "template": (template_path, os.path.getmtime(template_path), structure_key),
+        "doc": doc,
+        "pristine": [deepcopy(para._p) for para in paragraphs],
+        "slots": [para._p for para in paragraphs],
+        "parents": [para._parent for para in paragraphs],
+        "token_index": token_index,
+        "placeholders": dict(placeholders),
+        "pdf": None,
+        "used_at": time.time(),
+    }
+    fill_paragraphs(paragraphs, placeholders)
+    return job
+
+def _patch_job(job, placeholders, fill_paragraphs):
+    """Re-fill only the paragraphs that use a changed placeholder. Returns True if anything changed."""
+    previous = job["placeholders"]
+    changed = {key for key in set(placeholders) | set(previous) if placeholders.get(key) != previous.get(key)}
+    if not changed:
+        return False
+
+    affected = sorted({i for key in changed for i in job["token_index"].get(key, ())})
+    for i in affected:
+        pristine = deepcopy(job["pristine"][i])
+        job["slots"][i].getparent().replace(job["slots"][i], pristine)
+        job["slots"][i] = pristine
+
+    fill_paragraphs([Paragraph(job["slots"][i], job["parents"][i]) for i in affected], placeholders)
+    job["placeholders"] = dict(placeholders)
+    job["pdf"] = None
+    return True
+
+# ========== PUBLIC API ==========
+
+def save_incremental(kind, template_path, placeholders, fill_paragraphs, output_path,
+                     prepare=None, structure_key=None):
+    """Fill and save a template, patching the session's previous fill when possible.
+
+    `fill_paragraphs(paragraphs, placeholders)` is the generator's own
+    replacer. `prepare(doc)` makes structural edits (e.g. cloned table rows)
+    before filling; a different `structure_key` forces a full rebuild.
+    Returns False when nothing changed since the last job, so the previous
+    PDF can be reused.
+    """
+    job = _get_job(kind)
+    signature = (template_path, os.path.getmtime(template_path), structure_key)
+
+    if job is not None and job["template"] == signature:
+        changed = _patch_job(job, placeholders, fill_paragraphs)
+    else:
+        job = _fresh_job(template_path, placeholders, fill_paragraphs, prepare, structure_key)
+        st.session_state[_state_key(kind)] = job
+        changed = True
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    job["doc"].save(output_path)
+    return changed
+
+def reuse_pdf(kind, pdf_path):
+    """Write the previous job's PDF to pdf_path if it is still valid. Returns True on success."""
+    job = _get_job(kind)
+    if not job or job["pdf"] is None:
+        return False
+    with open(pdf_path, "wb") as f:
+        f.write(job["pdf"])
+    return True
+
+def remember_pdf(kind, pdf_path):
+    """Keep the converted PDF with the session's last job."""
+    job = _get_job(kind)
+    if job is not None and os.path.exists(pdf_path):
+        with open(pdf_path, "rb") as f:
+            job["pdf"] = f.read()
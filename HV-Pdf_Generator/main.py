@@ -1,16 +1,24 @@
 import streamlit as st
 from session_manager import initialize_session_state
+from incremental_render import evict_stale_jobs
 from firebase_utils import upload_to_firebase , show_documents , manage_documents
 from firebase_config import initialize_firebase
+from warmup import start_background_warmup, is_ready, warmup_status
+from bundle import session_bundle_entries, show_bundle_download
+from resource_governor import metrics as governor_metrics
 
 from generators.nda import generate_nda
 from generators.hiring import generate_hiring
 from generators.invoice import generate_invoice
 from generators.contract import generate_contract
+from template_import import show_template_import
+from profiling import admin_enabled, show_profiling_admin
 
 
 initialize_firebase()
 initialize_session_state()
+evict_stale_jobs()
+start_background_warmup()
 
 def main():
 
@@ -29,8 +37,19 @@ def main():
 
     st.set_page_config(page_title="Documnet Generator and firebase Manager" , layout="wide")
     st.sidebar.title("Application menu")
+    if warmup_status()["failed"]:
+        st.sidebar.caption("⚠️ Converter warm-up failed; the first conversion may be slow.")
+    elif not is_ready():
+        st.sidebar.caption("⏳ Warming up the document converter...")
 
-    section = st.sidebar.radio("Choose Section",["Document Generator" , "Firebase Crud Operations"])
+    load = governor_metrics()
+    if load["queue_depth"] or load["in_flight"]:
+        st.sidebar.metric("Conversion queue", load["queue_depth"], help=f"{load['in_flight']} running, {load['rss_mb']} MB RSS")
+
+    sections = ["Document Generator" , "Firebase Crud Operations", "Template Import"]
+    if admin_enabled():
+        sections.append("Profiling")
+    section = st.sidebar.radio("Choose Section", sections)
 
     if section == "Document Generator":
         doc_choice = st.sidebar.radio("Select Document type" , document_type)
@@ -47,6 +66,10 @@ def main():
         elif doc_choice == "Contract":
             generate_contract()
 
+        # One ZIP for everything generated in this session, built on demand
+        with st.sidebar:
+            show_bundle_download(session_bundle_entries(), key="session", file_name="generated_documents.zip")
+
     elif section == "Firebase Crud Operations":
         crud_choice = st.sidebar.radio("Choose Operation" , operations)
 
@@ -72,6 +95,12 @@ def main():
             st.subheader("Update/Delete Documents")
             manage_documents()
 
+    elif section == "Template Import":
+        show_template_import()
+
+    elif section == "Profiling":
+        show_profiling_admin()
+
 
 if __name__ == "__main__":
     main()
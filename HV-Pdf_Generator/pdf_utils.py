@@ -1,5 +1,7 @@
+import hashlib
 import os
 import platform
+import re
 import subprocess
 import shutil
 import tempfile
@@ -9,6 +11,11 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Pt, Inches
 from docx.oxml.ns import qn
 
+from docx_utils import iter_placeholder_paragraphs, is_in_table
+from image_cache import get_scaled_image
+from profiling import stage
+from resource_governor import admit
+
 logger = logging.getLogger("pdf_utils")
 
 # ========== FORMATTING HELPERS ==========
@@ -20,32 +27,62 @@ def apply_formatting(run, font_name="Calibri", font_size=11, bold=False):
     run.font.size = Pt(font_size)
     run.bold = bold
 
-def apply_image_placeholder(doc, placeholder_key, image_file):
-    """Replace a placeholder with an image."""
-    placeholder_found = False
-
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for para in cell.paragraphs:
-                    if placeholder_key in para.text:
-                        para.clear()
-                        run = para.add_run()
-                        run.add_picture(image_file, width=Inches(1.5), height=Inches(0.75))
-                        placeholder_found = True
-
-    for para in doc.paragraphs:
-        if placeholder_key in para.text:
-            para.clear()
-            run = para.add_run()
-            run.add_picture(image_file, width=Inches(1.2), height=Inches(0.75))
-            placeholder_found = True
+# Image size per placeholder location, in inches (width, height)
+TABLE_IMAGE_SIZE = (1.5, 0.75)
+BODY_IMAGE_SIZE = (1.2, 0.75)
+
+def build_placeholder_index(doc, placeholder_keys):
+    """Map each placeholder key to the (paragraph, size) locations that contain it.
+
+    The document (body, headers, footers, text boxes) is walked once no matter
+    how many keys are looked up.
+    """
+    index = {key: [] for key in placeholder_keys}
+
+    for para in iter_placeholder_paragraphs(doc):
+        text = para.text
+        size = TABLE_IMAGE_SIZE if is_in_table(para) else BODY_IMAGE_SIZE
+        for key in index:
+            if key in text:
+                index[key].append((para, size))
 
-    if not placeholder_found:
-        logger.warning(f"Placeholder '{placeholder_key}' not found in the document.")
+    return index
+
+def apply_image_placeholders(doc, images, index=None):
+    """Replace several image placeholders in one pass.
+
+    `images` maps placeholder keys to image paths or file-like objects. Each
+    image is downscaled once per target size and shared across documents.
+    """
+    if index is None:
+        index = build_placeholder_index(doc, images)
+
+    # Group by paragraph so keys sharing one are cleared once and all kept
+    by_paragraph = {}
+    for placeholder_key, image_file in images.items():
+        locations = index.get(placeholder_key, [])
+        if not locations:
+            logger.warning(f"Placeholder '{placeholder_key}' not found in the document.")
+            continue
+
+        for para, size in locations:
+            entry = by_paragraph.setdefault(id(para._p), (para, size, []))
+            entry[2].append((para.text.find(placeholder_key), image_file))
+
+    for para, (width, height), pictures in by_paragraph.values():
+        para.clear()
+        # Images follow the order their placeholders had in the text
+        for _, image_file in sorted(pictures, key=lambda picture: picture[0]):
+            run = para.add_run()
+            run.add_picture(get_scaled_image(image_file, width, height),
+                            width=Inches(width), height=Inches(height))
 
     return doc
 
+def apply_image_placeholder(doc, placeholder_key, image_file):
+    """Replace a placeholder with an image."""
+    return apply_image_placeholders(doc, {placeholder_key: image_file})
+
 # ========== DOCX -> PDF CONVERTER ==========
 
 def convert_to_pdf(doc_path, pdf_path):
@@ -56,7 +93,7 @@ def convert_to_pdf(doc_path, pdf_path):
     if not os.path.exists(doc_path):
         raise FileNotFoundError(f"Word document not found at {doc_path}")
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with admit("convert"), tempfile.TemporaryDirectory() as temp_dir:
         temp_pdf_path = os.path.join(temp_dir, "temp_output.pdf")
 
         if platform.system() == "Windows":
@@ -75,10 +112,11 @@ def convert_to_pdf(doc_path, pdf_path):
                 raise Exception(f"Error using COM on Windows: {e}")
         else:
             try:
-                subprocess.run(
-                    ['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', temp_dir, doc_path],
-                    check=True
-                )
+                with stage("libreoffice"):
+                    subprocess.run(
+                        ['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', temp_dir, doc_path],
+                        check=True
+                    )
                 temp_pdf_path = os.path.join(temp_dir, os.path.basename(doc_path).replace('.docx', '.pdf'))
             except subprocess.CalledProcessError as e:
                 raise Exception(f"Error using LibreOffice: {e}")
@@ -87,3 +125,72 @@ def convert_to_pdf(doc_path, pdf_path):
 
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"Flattened PDF file was not saved correctly: {pdf_path}")
+
+    normalize_pdf(pdf_path)
+
+# ========== DETERMINISTIC OUTPUT ==========
+
+FIXED_PDF_DATE = "D:20000101000000Z"
+_TRAILER_ID = re.compile(rb"/ID\s*\[\s*<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*\]")
+
+def _rebuild_info(doc):
+    """Rewrite the /Info dictionary with only its non-empty keys, in sorted order.
+
+    set_metadata() keeps the converter's original key order and leaves
+    cleared keys behind as nulls, so the same content could serialize
+    differently.
+    """
+    import fitz  # PyMuPDF
+
+    kind, value = doc.xref_get_key(-1, "Info")
+    if kind != "xref":
+        return
+    xref = int(value.split()[0])
+    entries = []
+    for key in sorted(doc.xref_get_keys(xref)):
+        kind, value = doc.xref_get_key(xref, key)
+        if kind != "null" and value:
+            entries.append(f"/{key} {fitz.get_pdf_str(value) if kind == 'string' else value}")
+    doc.update_object(xref, "<<" + "".join(entries) + ">>")
+
+def normalize_pdf(pdf_path):
+    """Rewrite a PDF so identical content always yields identical bytes.
+
+    Pins the info dates, drops producer/creator and the XMP packet (which
+    carries timestamps and UUIDs), rebuilds /Info in sorted key order, renumbers objects in a fixed order and
+    replaces the random trailer /ID with a hash of the content. Failures are
+    logged and leave the file as converted.
+    """
+    try:
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as doc:
+            doc.set_metadata({
+                "title": doc.metadata.get("title", ""),
+                "author": "",
+                "subject": "",
+                "keywords": "",
+                "creator": "",
+                "producer": "",
+                "creationDate": FIXED_PDF_DATE,
+                "modDate": FIXED_PDF_DATE,
+            })
+            doc.del_xml_metadata()
+            _rebuild_info(doc)
+            data = doc.tobytes(garbage=4, deflate=True, clean=True)
+
+        # Derive the /ID from the content itself, keeping its length so offsets stay valid
+        matches = list(_TRAILER_ID.finditer(data))
+        if matches:
+            match = matches[-1]
+            zeroed = data[:match.start()] + data[match.end():]
+            digest = hashlib.sha256(zeroed).hexdigest().upper().encode()
+            (start1, end1), (start2, end2) = match.span(1), match.span(2)
+            first = digest[:end1 - start1].ljust(end1 - start1, b"0")
+            second = digest[:end2 - start2].ljust(end2 - start2, b"0")
+            data = data[:start1] + first + data[end1:start2] + second + data[end2:]
+
+        with open(pdf_path, "wb") as f:
+            f.write(data)
+    except Exception as e:
+        logger.warning(f"Could not normalize {pdf_path}: {e}")
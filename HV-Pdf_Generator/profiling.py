@@ -0,0 +1,201 @@
+"""Opt-in per-request profiling for slow generations.
+
+Set PROFILE_REQUESTS=1, or open the app with `?admin=<ADMIN_TOKEN>&profile=1`,
+to capture every generation request. Each capture is a cProfile `.prof` file (open it with
+snakeviz, or turn it into a flamegraph with flameprof/gprof2dot) plus a JSON
+sidecar with the request's parameters, stage timings and the CPU time spent
+in child processes such as LibreOffice. Open the app with `?admin=<ADMIN_TOKEN>`
+to see the slowest recent captures. ADMIN_TOKEN comes from st.secrets or the
+environment; without one, only PROFILE_REQUESTS can turn profiling on.
+"""
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import streamlit as st
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+logger = logging.getLogger("profiling")
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join("app", "profiles"))
+MAX_CAPTURES = int(os.environ.get("PROFILE_MAX_CAPTURES", 50))
+
+# One capture at a time keeps profiles (and child-process totals) from mixing
+_capture_lock = threading.Lock()
+_local = threading.local()
+
+# ========== SWITCHES ==========
+
+def _admin_token():
+    try:
+        token = st.secrets.get("ADMIN_TOKEN")
+    except Exception:
+        token = None
+    return token or os.environ.get("ADMIN_TOKEN")
+
+def admin_enabled():
+    """True when the `?admin=` query parameter matches the configured ADMIN_TOKEN."""
+    token = _admin_token()
+    if not token:
+        return False
+    try:
+        supplied = st.query_params.get("admin") or ""
+    except Exception:
+        return False
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+def profiling_enabled():
+    """True when PROFILE_REQUESTS=1, or an admin adds `profile=1` to the URL."""
+    if os.environ.get("PROFILE_REQUESTS") == "1":
+        return True
+    try:
+        return st.query_params.get("profile") == "1" and admin_enabled()
+    except Exception:
+        return False
+
+# ========== CAPTURE ==========
+
+def _children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+@contextmanager
+def stage(name):
+    """Time a named step of the current capture; a no-op when nothing is being profiled."""
+    capture = getattr(_local, "capture", None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if capture is not None:
+            capture["stages"].append([name, round(time.perf_counter() - start, 4)])
+
+@contextmanager
+def profile_request(kind, params=None):
+    """Profile one request when profiling is enabled and save the capture.
+
+    Child-process CPU is read from RUSAGE_CHILDREN, which only counts children
+    that have exited, so it covers each completed LibreOffice run.
+    """
+    if not profiling_enabled() or not _capture_lock.acquire(blocking=False):
+        yield
+        return
+
+    capture = {
+        "kind": kind,
+        "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "params": dict(params or {}),
+        "stages": [],
+    }
+    _local.capture = capture
+    children_before = _children_cpu()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        capture["wall_seconds"] = round(time.perf_counter() - start, 4)
+        capture["children_cpu_seconds"] = round(_children_cpu() - children_before, 4)
+        _local.capture = None
+        _capture_lock.release()
+        try:
+            _save(profiler, capture)
+        except Exception as e:
+            logger.warning("Could not save profile for %s: %s", kind, e)
+
+# ========== STORE ==========
+
+def _save(profiler, capture):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    now = time.time()
+    capture_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}_{capture['kind']}_{uuid.uuid4().hex[:6]}"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, f"{capture_id}.prof"))
+    with open(os.path.join(PROFILE_DIR, f"{capture_id}.json"), "w") as f:
+        json.dump(capture, f, indent=2, default=str)
+    _prune()
+
+def _prune():
+    """Keep only the newest MAX_CAPTURES captures (ids sort by time)."""
+    ids = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for capture_id in ids[:-MAX_CAPTURES]:
+        for ext in (".json", ".prof"):
+            path = os.path.join(PROFILE_DIR, capture_id + ext)
+            if os.path.exists(path):
+                os.remove(path)
+
+def list_captures():
+    """Return every stored capture's metadata, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    captures = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    captures.append(dict(json.load(f), id=name[:-5]))
+            except (OSError, ValueError):
+                continue
+    return captures
+
+def slowest_captures(limit=20):
+    """Return the slowest stored captures by wall time."""
+    return sorted(list_captures(), key=lambda c: c.get("wall_seconds", 0), reverse=True)[:limit]
+
+def top_functions(capture_id, limit=25):
+    """Return a text table of the functions with the most cumulative time."""
+    out = io.StringIO()
+    stats = pstats.Stats(os.path.join(PROFILE_DIR, f"{capture_id}.prof"), stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+# ========== ADMIN PAGE ==========
+
+def show_profiling_admin():
+    """List the slowest recent captures and let an admin inspect or download one."""
+    # Captures hold client details, so check again rather than trust the caller
+    if not admin_enabled():
+        st.error("Admin access required.")
+        return
+    st.subheader("Request Profiles")
+    if not profiling_enabled():
+        st.caption("Profiling is off. Set PROFILE_REQUESTS=1 or add &profile=1 to this URL to capture requests.")
+
+    captures = slowest_captures()
+    if not captures:
+        st.info("No captures yet.")
+        return
+
+    st.dataframe([{
+        "Request": c["kind"],
+        "Started": c["started"],
+        "Wall (s)": c.get("wall_seconds"),
+        "Child CPU (s)": c.get("children_cpu_seconds"),
+        "Stages": ", ".join(f"{name} {seconds:.2f}s" for name, seconds in c.get("stages", [])),
+    } for c in captures], use_container_width=True)
+
+    labels = {f"{c.get('wall_seconds', 0):.2f}s · {c['id']}": c for c in captures}
+    selected = labels[st.selectbox("Capture", list(labels))]
+    st.json(selected["params"], expanded=False)
+
+    prof_path = os.path.join(PROFILE_DIR, f"{selected['id']}.prof")
+    if os.path.exists(prof_path):
+        st.code(top_functions(selected["id"]))
+        with open(prof_path, "rb") as f:
+            st.download_button("Download .prof", data=f, file_name=f"{selected['id']}.prof",
+                               mime="application/octet-stream")
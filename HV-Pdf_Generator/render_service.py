@@ -0,0 +1,100 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+logger = logging.getLogger("render_service")
+
+FORMATS = {"PNG": "PNG", "JPEG": "JPEG", "WEBP": "WEBP"}
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+MAX_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 1))
+MAX_OPEN_DOCS = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# ========== WORKER SIDE ==========
+
+# Each worker process keeps its own open fitz handles, keyed by path and mtime
+_open_docs = {}
+
+def _get_doc(pdf_path):
+    key = (pdf_path, os.path.getmtime(pdf_path))
+    doc = _open_docs.get(key)
+    if doc is None:
+        if len(_open_docs) >= MAX_OPEN_DOCS:
+            _open_docs.pop(next(iter(_open_docs))).close()
+        doc = _open_docs[key] = fitz.open(pdf_path)
+    return doc
+
+def render_page(pdf_path, page_no, dpi=150, fmt="PNG", quality=85):
+    """Rasterize one page and return it encoded in the requested format."""
+    page = _get_doc(pdf_path)[page_no]
+    pix = page.get_pixmap(dpi=dpi)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    out = io.BytesIO()
+    if fmt == "PNG":
+        img.save(out, format="PNG", optimize=False)
+    else:
+        img.save(out, format=FORMATS[fmt], quality=quality)
+    return page_no, out.getvalue()
+
+# ========== CALLER SIDE ==========
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the Streamlit server is multi-threaded
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def page_count(pdf_path):
+    """Return the number of pages in a PDF."""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def iter_rendered_pages(pdf_path, pages=None, dpi=150, fmt="PNG", quality=85):
+    """Rasterize a page range in parallel, yielding (page_no, image_bytes) as each page completes.
+
+    `pages` is an iterable of 0-based page numbers (default: all pages).
+    Output order follows completion, not page order.
+    """
+    fmt = fmt.upper()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+
+    pdf_path = os.path.abspath(pdf_path)
+    pages = list(range(page_count(pdf_path)) if pages is None else pages)
+
+    # Imported here so spawned workers, which re-import this module, don't load Streamlit
+    from resource_governor import admit
+
+    # One governor slot per worker process the preview keeps busy
+    workers = max(1, min(len(pages), MAX_WORKERS))
+    with admit("preview", slots=workers):
+        if workers <= 1:
+            # Not worth a round-trip to the pool
+            for page_no in pages:
+                yield render_page(pdf_path, page_no, dpi, fmt, quality)
+            return
+
+        pool = _get_pool()
+        futures = [pool.submit(render_page, pdf_path, page_no, dpi, fmt, quality) for page_no in pages]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def render_pages(pdf_path, pages=None, dpi=150, fmt="PNG", quality=85):
+    """Rasterize a page range and return the images in page order."""
+    results = dict(iter_rendered_pages(pdf_path, pages, dpi, fmt, quality))
+    return [results[page_no] for page_no in sorted(results)]
@@ -0,0 +1,156 @@
+import glob
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger("resource_governor")
+
+# Budgets sized for the 1 CPU / 2 GB App Engine instance; override per deployment
+MAX_JOBS = int(os.environ.get("GOVERNOR_MAX_JOBS", os.cpu_count() or 1))
+MAX_RSS_MB = int(os.environ.get("GOVERNOR_MAX_RSS_MB", 1400))
+MAX_QUEUE = int(os.environ.get("GOVERNOR_MAX_QUEUE", 8))
+POLL_SECONDS = 0.5
+
+
+class GovernorBusy(Exception):
+    """Raised when the queue is full and a request is shed."""
+
+
+# ========== MEMORY ==========
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+def _children(pid):
+    pids = []
+    for path in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(path) as f:
+                pids.extend(f.read().split())
+        except OSError:
+            continue
+    return pids
+
+def process_rss_mb():
+    """RSS of this process and all its descendants, in MB. 0 where /proc is unavailable.
+
+    The whole tree is walked because `libreoffice` execs oosplash, which
+    starts the real converter (soffice.bin) as its own child.
+    """
+    total = _rss_kb("self")
+    seen = set()
+    pending = _children("self")
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        total += _rss_kb(pid)
+        pending.extend(_children(pid))
+    return total // 1024
+
+# ========== ADMISSION ==========
+
+_cond = threading.Condition()
+_queue = deque()
+_stats = {"in_flight": 0, "admitted": 0, "shed": 0}
+
+def metrics():
+    """Current governor state, for display and logging."""
+    with _cond:
+        return {
+            "in_flight": _stats["in_flight"],
+            "queue_depth": len(_queue),
+            "admitted": _stats["admitted"],
+            "shed": _stats["shed"],
+            "rss_mb": process_rss_mb(),
+        }
+
+def _can_start(ticket, slots):
+    if _queue[0] is not ticket:
+        return False
+    if _stats["in_flight"] == 0:
+        # Always let one job through so a high baseline RSS can't stall everything
+        return True
+    return _stats["in_flight"] + slots <= MAX_JOBS and process_rss_mb() < MAX_RSS_MB
+
+def _status_callback():
+    """Return a callback that shows the queue position in the Streamlit page, if there is one."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx() is None:
+            return None
+    except ImportError:
+        return None
+
+    placeholder = st.empty()
+
+    def show(position):
+        if position is None:
+            placeholder.empty()
+        else:
+            placeholder.info(f"⏳ Server busy, queued at position {position}...")
+    return show
+
+@contextmanager
+def admit(kind, slots=1):
+    """Hold slots for one heavy job (conversion, preview, merge), queueing FIFO when over budget.
+
+    A job that fans out to several worker processes takes one slot per worker.
+    """
+    slots = max(1, min(slots, MAX_JOBS))
+    ticket = object()
+    with _cond:
+        if len(_queue) >= MAX_QUEUE:
+            _stats["shed"] += 1
+            logger.warning(f"Shedding {kind} job, queue depth {len(_queue)}")
+            raise GovernorBusy("The server is busy right now. Please try again in a moment.")
+        _queue.append(ticket)
+
+    show = None
+    try:
+        while True:
+            with _cond:
+                if _can_start(ticket, slots):
+                    _queue.popleft()
+                    _stats["in_flight"] += slots
+                    _stats["admitted"] += 1
+                    break
+                position = _queue.index(ticket) + 1
+
+            # Update the UI outside the lock, then wait for a slot to free up
+            if show is None:
+                show = _status_callback() or (lambda position: None)
+            show(position)
+            with _cond:
+                _cond.wait(POLL_SECONDS)
+    except BaseException:
+        with _cond:
+            if ticket in _queue:
+                _queue.remove(ticket)
+            _cond.notify_all()
+        raise
+    finally:
+        if show is not None:
+            show(None)
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _cond:
+            _stats["in_flight"] -= slots
+            _cond.notify_all()
+        logger.info(f"{kind} job finished in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,181 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger("search_index")
+
+INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", os.path.join("app", "search_index.db"))
+
+# A single worker serializes SQLite writes and keeps extraction off the UI thread
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+
+# Rows are keyed by document, not content: the same PDF under two names is two results
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    hash TEXT,
+    doc_type TEXT,
+    name TEXT,
+    client TEXT,
+    date TEXT,
+    link TEXT,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents (hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    doc_id UNINDEXED, hash UNINDEXED, name, client, doc_type, body,
+    tokenize = 'porter unicode61'
+);
+"""
+
+# ========== STORAGE ==========
+
+@contextmanager
+def _connect():
+    """Open the index, commit on success and always close the connection."""
+    os.makedirs(os.path.dirname(INDEX_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # The index is a local cache, so an older layout is simply rebuilt
+            conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS documents_fts;")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.executescript(SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _read_pdf(pdf):
+    """Accept a path, raw bytes or a file-like object and return the bytes."""
+    if isinstance(pdf, (bytes, bytearray)):
+        return bytes(pdf)
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    with open(pdf, "rb") as f:
+        return f.read()
+
+def extract_text(pdf_bytes):
+    """Extract the plain text of every page."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+# ========== INDEXING ==========
+
+def index_pdf(pdf, doc_type, name, client="", date=None, link="", doc_id=None):
+    """Add or replace a document in the index.
+
+    `doc_id` identifies the document (the Firestore id for uploads); it
+    defaults to the type and file name, so regenerating a file replaces its
+    entry. Text is only extracted when no document with the same content
+    hash has been indexed yet.
+    """
+    data = _read_pdf(pdf)
+    digest = hashlib.sha256(data).hexdigest()
+    doc_id = doc_id or f"{doc_type}:{name}"
+    if date is None:
+        date = datetime.now()
+    if not isinstance(date, str):
+        date = date.strftime("%Y-%m-%d")
+
+    with _connect() as conn:
+        known = conn.execute(
+            "SELECT body FROM documents_fts WHERE hash = ? ORDER BY doc_id = ? DESC LIMIT 1", (digest, doc_id)
+        ).fetchone()
+        body = known["body"] if known else extract_text(data)
+
+        conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM documents_fts WHERE doc_id = ?", (doc_id,))
+        conn.execute(
+            "INSERT INTO documents (doc_id, hash, doc_type, name, client, date, link, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (doc_id, digest, doc_type, name, client, date, link, datetime.now().isoformat(timespec="seconds")),
+        )
+        conn.execute(
+            "INSERT INTO documents_fts (doc_id, hash, name, client, doc_type, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (doc_id, digest, name, client, doc_type, body),
+        )
+    return digest
+
+def index_pdf_async(pdf, doc_type, name, client="", date=None, link="", doc_id=None):
+    """Queue a PDF for indexing in the background. Bytes are read now, so temp files may be removed."""
+    try:
+        data = _read_pdf(pdf)
+    except OSError as e:
+        logger.warning(f"Could not read {pdf} for indexing: {e}")
+        return None
+
+    def run():
+        try:
+            return index_pdf(data, doc_type, name, client=client, date=date, link=link, doc_id=doc_id)
+        except Exception as e:
+            logger.warning(f"Indexing '{name}' failed: {e}")
+
+    return _executor.submit(run)
+
+def indexed_ids():
+    """Return the ids of every indexed document."""
+    with _connect() as conn:
+        return {row["doc_id"] for row in conn.execute("SELECT doc_id FROM documents")}
+
+def _remove(doc_ids):
+    with _connect() as conn:
+        for doc_id in doc_ids:
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM documents_fts WHERE doc_id = ?", (doc_id,))
+
+def remove_from_index(doc_ids):
+    """Drop documents from the index.
+
+    Runs on the indexing worker, so it is applied after any indexing already queued for them.
+    """
+    def run():
+        try:
+            _remove(list(doc_ids))
+        except Exception as e:
+            logger.warning(f"Removing {len(doc_ids)} document(s) from the index failed: {e}")
+
+    return _executor.submit(run)
+
+# ========== SEARCH ==========
+
+def _to_match_query(query):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+def search(query, page=1, per_page=10):
+    """Return (results, total) for a query, ranked by BM25 and paginated."""
+    match = _to_match_query(query)
+    if match is None:
+        return [], 0
+
+    with _connect() as conn:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM documents_fts WHERE documents_fts MATCH ?", (match,)
+        ).fetchone()[0]
+        rows = conn.execute(
+            """
+            SELECT d.doc_id, d.hash, d.doc_type, d.name, d.client, d.date, d.link,
+                   snippet(documents_fts, 5, '**', '**', ' … ', 12) AS snippet
+            FROM documents_fts
+            JOIN documents d ON d.doc_id = documents_fts.doc_id
+            WHERE documents_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            (match, per_page, (page - 1) * per_page),
+        ).fetchall()
+
+    return [dict(row) for row in rows], total
@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+URL_TTL = int(os.environ.get("SIGNED_URL_TTL", 3600))  # seconds
+REFRESH_MARGIN = 300  # re-sign links with less than this left
+
+# blob name -> (url, expires_at); shared by every session in the process
+_cache = {}
+_lock = threading.Lock()
+
+# ========== SIGNING ==========
+
+def _sign(bucket, blob_name):
+    # V4 signing uses the service-account key locally; no request is made
+    return bucket.blob(blob_name).generate_signed_url(
+        version="v4", expiration=timedelta(seconds=URL_TTL), method="GET"
+    )
+
+def signed_url(bucket, blob_name):
+    """Return a time-limited GET link for a blob, reusing a cached one while it is still fresh."""
+    return signed_urls(bucket, [blob_name])[blob_name]
+
+def signed_urls(bucket, blob_names):
+    """Return {blob_name: url} for many blobs, signing only the ones without a fresh cached link."""
+    now = time.time()
+    with _lock:
+        urls = {name: url for name in blob_names
+                for url, expires_at in [_cache.get(name, (None, 0))]
+                if expires_at - now > REFRESH_MARGIN}
+
+    missing = [name for name in dict.fromkeys(blob_names) if name not in urls]
+    fresh = {name: _sign(bucket, name) for name in missing}
+    if fresh:
+        with _lock:
+            for name, url in fresh.items():
+                _cache[name] = (url, now + URL_TTL)
+    urls.update(fresh)
+    return urls
+
+def forget_signed_urls(blob_names=None):
+    """Drop cached links (e.g. after the blobs are deleted); all of them when no names are given."""
+    with _lock:
+        if blob_names is None:
+            _cache.clear()
+        for name in blob_names or ():
+            _cache.pop(name, None)
@@ -0,0 +1,193 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+
+import fitz  # PyMuPDF
+import streamlit as st
+from docx import Document
+from pdf2docx import Converter
+
+from docx_utils import iter_placeholder_paragraphs
+from resource_governor import admit
+from template_lint import IMPORTED_DIR, TOKEN_PATTERN, extract_placeholders
+
+logger = logging.getLogger("template_import")
+
+# Below this many pages, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 4
+
+# ========== CONVERSION ==========
+
+def _convert(pdf_path, docx_path, workers):
+    cv = Converter(pdf_path)
+    try:
+        if workers > 1:
+            # pdf2docx splits the pages into one contiguous range per worker
+            cv.convert(docx_path, multi_processing=True, cpu_count=workers)
+        else:
+            cv.convert(docx_path)
+    finally:
+        cv.close()
+
+def _convert_worker(pdf_path, docx_path, workers, conn):
+    """Entry point of the spawned converter process."""
+    try:
+        # pdf2docx writes pages-{i}.json scratch files into the working directory
+        os.chdir(os.path.dirname(docx_path))
+        _convert(pdf_path, docx_path, workers)
+        conn.send(None)
+    except Exception as e:
+        conn.send(f"{type(e).__name__}: {e}")
+    finally:
+        conn.close()
+
+def plan_conversion(pdf_path, workers=None):
+    """Return (pages, workers) for a PDF; workers is 1 when the file is too small to split."""
+    workers = workers or os.cpu_count() or 1
+    with fitz.open(pdf_path) as pdf:
+        pages = pdf.page_count
+    if pages < PARALLEL_MIN_PAGES:
+        return pages, 1
+    return pages, max(1, min(workers, pages))
+
+def convert_pdf_to_docx(pdf_path, docx_path, workers=None):
+    """Convert a PDF to DOCX, parsing page ranges in parallel worker processes for larger files.
+
+    The parallel path runs in a spawned child whose working directory is the
+    DOCX's folder: pdf2docx forks a bare multiprocessing.Pool (unsafe from the
+    threaded Streamlit server), never closes it and writes scratch files to
+    the current directory. The child's exit takes the pool with it.
+    """
+    pages, workers = plan_conversion(pdf_path, workers)
+    if workers <= 1:
+        _convert(pdf_path, docx_path, 1)
+        return pages
+
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_convert_worker, args=(pdf_path, docx_path, workers, sender), name="pdf2docx")
+    process.start()
+    sender.close()
+    try:
+        error = receiver.recv()
+    except EOFError:
+        error = "converter process exited unexpectedly"
+    except BaseException:
+        process.terminate()
+        raise
+    finally:
+        process.join()
+        receiver.close()
+
+    if error:
+        raise RuntimeError(f"PDF to DOCX conversion failed: {error}")
+    return pages
+
+def merge_split_tokens(doc):
+    """Join runs so every `<<...>>` token sits in a single run, keeping the first run's formatting.
+
+    PDF conversion often breaks a token into several runs, which run-level
+    replacers can't see. Returns the number of tokens that were joined.
+    """
+    merged = 0
+    for para in iter_placeholder_paragraphs(doc):
+        while True:
+            runs = para.runs
+            bounds, offset = [], 0
+            for run in runs:
+                bounds.append((offset, offset + len(run.text)))
+                offset += len(run.text)
+
+            split = None
+            for match in TOKEN_PATTERN.finditer("".join(run.text for run in runs)):
+                first = next(i for i, (start, end) in enumerate(bounds) if start <= match.start() < end)
+                last = next(i for i, (start, end) in enumerate(bounds) if start < match.end() <= end)
+                if first != last:
+                    split = (first, last)
+                    break
+            if split is None:
+                break
+
+            first, last = split
+            runs[first].text = "".join(run.text for run in runs[first:last + 1])
+            for run in runs[first + 1:last + 1]:
+                run._r.getparent().remove(run._r)
+            merged += 1
+    return merged
+
+# ========== IMPORT ==========
+
+def import_pdf_template(pdf_bytes, name, workers=None, overwrite=False):
+    """Convert an uploaded PDF into a DOCX template under templates/imported.
+
+    Imported templates are linted and their placeholders cached; the
+    generators keep using their bundled templates. Raises FileExistsError if
+    a template with this name exists and `overwrite` is False.
+    Returns (template_path, pages, placeholder info).
+    """
+    safe_name = "".join(c if c.isalnum() or c in " -_" else "_" for c in name).strip() or "Imported Template"
+    os.makedirs(IMPORTED_DIR, exist_ok=True)
+    template_path = os.path.join(IMPORTED_DIR, f"{safe_name}.docx")
+    if os.path.exists(template_path) and not overwrite:
+        raise FileExistsError(f"A template named '{safe_name}' already exists")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_path = os.path.join(temp_dir, "source.pdf")
+        docx_path = os.path.join(temp_dir, "converted.docx")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+
+        # One governor slot per worker process the conversion actually starts
+        pages, workers = plan_conversion(pdf_path, workers)
+        with admit("import", slots=workers):
+            convert_pdf_to_docx(pdf_path, docx_path, workers)
+
+        doc = Document(docx_path)
+        merge_split_tokens(doc)
+        # Save where template lint and the placeholder cache pick it up
+        doc.save(template_path)
+
+    # Prime the placeholder index for the new template
+    return template_path, pages, extract_placeholders(template_path)
+
+# ========== STREAMLIT ==========
+
+def show_template_import():
+    """Upload a PDF and turn it into a DOCX template."""
+    st.subheader("Import PDF as Template")
+
+    with st.form("template_import_form"):
+        name = st.text_input("Template name")
+        uploaded_file = st.file_uploader("Template PDF", type=["pdf"])
+        overwrite = st.checkbox("Replace an existing template with the same name")
+        submitted = st.form_submit_button("Import")
+
+    if not (submitted and uploaded_file and name):
+        return
+
+    try:
+        with st.spinner("Converting PDF to Word..."):
+            template_path, pages, info = import_pdf_template(uploaded_file.getvalue(), name, overwrite=overwrite)
+    except FileExistsError as e:
+        st.error(f"{e}. Pick another name or tick 'Replace'.")
+        return
+    except Exception as e:
+        st.error(f"Import failed: {e}")
+        return
+
+    st.success(f"Imported {pages} page(s) as {os.path.basename(template_path)}")
+    if info.tokens:
+        st.markdown("**Placeholders found:** " + ", ".join(f"`{token}`" for token in sorted(info.tokens)))
+    else:
+        st.info("No <<...>> placeholders found; add them in Word and re-upload the DOCX.")
+    if info.split_tokens:
+        st.warning(f"Placeholders still split across runs: {', '.join(sorted(info.split_tokens))}")
+
+    with open(template_path, "rb") as f:
+        st.download_button(
+            label="📥 Download Template (Word)",
+            data=f,
+            file_name=os.path.basename(template_path),
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
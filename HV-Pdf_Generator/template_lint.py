@@ -0,0 +1,125 @@
+"""Pre-flight placeholder validation for DOCX templates.
+
+Run `python template_lint.py` to lint every bundled template, or
+`python template_lint.py --bench 50` to time cold vs cached extraction.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import streamlit as st
+from docx import Document
+
+from docx_utils import iter_placeholder_paragraphs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORTED_DIR = os.path.join(BASE_DIR, "templates", "imported")
+
+TOKEN_PATTERN = re.compile(r"<<[^<>]+>>")
+
+TemplateInfo = namedtuple("TemplateInfo", ["tokens", "split_tokens"])
+LintReport = namedtuple("LintReport", ["unknown_keys", "unfilled_tokens", "split_tokens"])
+
+# ========== PLACEHOLDER EXTRACTION ==========
+
+def list_templates(base_dir=BASE_DIR, include_imported=True):
+    """Return the bundled and, optionally, imported DOCX templates, sorted by name."""
+    bundled = sorted(glob.glob(os.path.join(base_dir, "*.docx")))
+    if not include_imported:
+        return bundled
+    return bundled + sorted(glob.glob(os.path.join(IMPORTED_DIR, "*.docx")))
+
+@lru_cache(maxsize=32)
+def _extract(template_path, mtime, size):
+    doc = Document(template_path)
+    tokens = set()
+    split_tokens = set()
+
+    for para in iter_placeholder_paragraphs(doc):
+        found = TOKEN_PATTERN.findall(para.text)
+        tokens.update(found)
+        for token in found:
+            # Run-level replacers can't see tokens that Word split across runs
+            if not any(token in run.text for run in para.runs):
+                split_tokens.add(token)
+
+    return TemplateInfo(frozenset(tokens), frozenset(split_tokens))
+
+def extract_placeholders(template_path):
+    """Return the placeholders used by a template, cached until the file changes."""
+    template_path = os.path.abspath(template_path)
+    stat = os.stat(template_path)
+    return _extract(template_path, stat.st_mtime, stat.st_size)
+
+# ========== VALIDATION ==========
+
+def validate_placeholders(template_path, placeholders, extra_keys=(), check_split=True):
+    """Check a placeholder dict against a template before doing any heavy work.
+
+    `extra_keys` lists keys filled by other means (e.g. cloned table rows), so
+    they are neither unknown nor unfilled. Generators that join a paragraph's
+    runs before replacing pass `check_split=False`, since split tokens still
+    get filled there.
+    """
+    info = extract_placeholders(template_path)
+    provided = set(placeholders) | set(extra_keys)
+
+    return LintReport(
+        unknown_keys=sorted(set(placeholders) - info.tokens),
+        unfilled_tokens=sorted(info.tokens - provided),
+        split_tokens=sorted(info.split_tokens) if check_split else [],
+    )
+
+def show_lint_warnings(report):
+    """Surface a lint report in the Streamlit UI."""
+    if report.unknown_keys:
+        st.warning(f"Fields not used by this template: {', '.join(report.unknown_keys)}")
+    if report.unfilled_tokens:
+        st.warning(f"Template placeholders left unfilled: {', '.join(report.unfilled_tokens)}")
+    if report.split_tokens:
+        st.warning(f"Placeholders split across formatting runs in the template: {', '.join(report.split_tokens)}")
+
+# ========== CLI ==========
+
+def lint_all(paths):
+    """Print the placeholders and problems found in each template."""
+    problems = 0
+    for path in paths:
+        info = extract_placeholders(path)
+        print(f"{os.path.basename(path)}: {len(info.tokens)} placeholders")
+        for token in sorted(info.tokens):
+            flag = "  (split across runs)" if token in info.split_tokens else ""
+            print(f"    {token}{flag}")
+        problems += len(info.split_tokens)
+    return problems
+
+def bench(paths, repeat):
+    """Time a cold extraction against cached lookups."""
+    for path in paths:
+        _extract.cache_clear()
+        start = time.perf_counter()
+        extract_placeholders(path)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            extract_placeholders(path)
+        warm = (time.perf_counter() - start) / repeat
+
+        print(f"{os.path.basename(path)}: cold {cold * 1000:.1f} ms, cached {warm * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lint placeholders in DOCX templates.")
+    parser.add_argument("templates", nargs="*", help="Templates to lint (default: all bundled templates)")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time extraction, repeating cached lookups N times")
+    args = parser.parse_args()
+
+    paths = args.templates or list_templates()
+    if args.bench:
+        bench(paths, args.bench)
+    else:
+        raise SystemExit(1 if lint_all(paths) else 0)
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+logger = logging.getLogger("thumbnails")
+
+THUMBNAIL_DIR = os.environ.get("THUMBNAIL_DIR", os.path.join("app", "thumbnails"))
+THUMBNAIL_DPI = 40
+THUMBNAIL_QUALITY = 70
+
+# Bounded so thumbnail work never competes with conversions for the whole CPU
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+
+# Digests queued or rendering; identical regenerations are submitted once
+_in_progress = set()
+_in_progress_lock = threading.Lock()
+
+# ========== HELPERS ==========
+
+def content_hash(data):
+    """Return the SHA-256 hex digest used to key thumbnails."""
+    return hashlib.sha256(data).hexdigest()
+
+def thumbnail_path(digest):
+    """Return where the thumbnail for a content hash is stored."""
+    return os.path.join(THUMBNAIL_DIR, f"{digest}.webp")
+
+def get_thumbnail(digest):
+    """Return the thumbnail path for a content hash, or None if it isn't ready."""
+    if not digest:
+        return None
+    path = thumbnail_path(digest)
+    return path if os.path.exists(path) else None
+
+# ========== GENERATION ==========
+
+def render_thumbnail(pdf_bytes, digest):
+    """Render the first page at low DPI and store it as WebP, unless it already exists."""
+    path = thumbnail_path(digest)
+    if os.path.exists(path):
+        return path
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        pix = doc[0].get_pixmap(dpi=THUMBNAIL_DPI)
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    # Write to a unique temp file, then rename, so readers never see a half-written file
+    fd, temp_path = tempfile.mkstemp(dir=THUMBNAIL_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format="WEBP", quality=THUMBNAIL_QUALITY)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+def generate_thumbnail_async(pdf):
+    """Queue thumbnail generation for a PDF (path, bytes or file-like) and return its content hash."""
+    try:
+        if isinstance(pdf, (bytes, bytearray)):
+            data = bytes(pdf)
+        elif hasattr(pdf, "getvalue"):
+            data = pdf.getvalue()
+        else:
+            with open(pdf, "rb") as f:
+                data = f.read()
+    except OSError as e:
+        logger.warning(f"Could not read {pdf} for thumbnail: {e}")
+        return None
+
+    digest = content_hash(data)
+    if get_thumbnail(digest):
+        return digest
+    with _in_progress_lock:
+        if digest in _in_progress:
+            return digest
+        _in_progress.add(digest)
+
+    def run():
+        try:
+            render_thumbnail(data, digest)
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed for {digest}: {e}")
+        finally:
+            with _in_progress_lock:
+                _in_progress.discard(digest)
+
+    _executor.submit(run)
+    return digest
@@ -0,0 +1,123 @@
+"""Start-up warm-up for the converter and templates.
+
+`python warmup.py` runs every step in the foreground and writes a ready
+marker (the container runs it before starting Streamlit, so the health
+check only passes once warm). It exits 1 when the converter stays cold, so
+Streamlit never starts on a cold instance. `python warmup.py --check` exits
+0 when the marker exists.
+"""
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from pdf_utils import convert_to_pdf
+from template_lint import extract_placeholders, list_templates
+
+logger = logging.getLogger("warmup")
+
+READY_MARKER = os.environ.get("WARMUP_MARKER", os.path.join(tempfile.gettempdir(), "hv_pdf_generator.ready"))
+
+DISK_STEPS = ("fonts", "converter")
+
+_lock = threading.Lock()
+_state = {"started": False, "ready": False, "failed": False, "error": None, "steps": {}}
+
+# ========== WARM-UP STEPS ==========
+
+def warm_font_cache():
+    """Build the fontconfig cache LibreOffice would otherwise build on first launch."""
+    if shutil.which("fc-cache"):
+        subprocess.run(["fc-cache"], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def warm_templates():
+    """Parse every bundled template so placeholder lookups are cached."""
+    for path in list_templates():
+        extract_placeholders(path)
+
+def warm_converter():
+    """Convert each bundled template once to create the LibreOffice profile and load its filters.
+
+    Imported templates are skipped: users can add any number of them, and
+    the bundled ones already load every filter the converter needs.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for path in list_templates(include_imported=False):
+            pdf_path = os.path.join(temp_dir, os.path.basename(path).replace(".docx", ".pdf"))
+            convert_to_pdf(path, pdf_path)
+
+# ========== ORCHESTRATION ==========
+
+def run_warmup(include_disk=True):
+    """Run the warm-up steps, recording how long each one took. Returns False if a disk step failed.
+
+    Disk steps (fonts, LibreOffice profile) persist across processes; the
+    template cache is per process. Firebase is already initialized when
+    main.py is imported, so it needs no step here.
+    """
+    steps = [("templates", warm_templates)]
+    if include_disk:
+        steps = [("fonts", warm_font_cache)] + steps + [("converter", warm_converter)]
+
+    disk_failed = False
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # A failed step only costs speed, never correctness
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+            _state["error"] = f"{name}: {e}"
+            disk_failed = disk_failed or name in DISK_STEPS
+        _state["steps"][name] = round(time.perf_counter() - start, 2)
+
+    # A cold converter must not pass the health check
+    if disk_failed:
+        _state["failed"] = True
+        return False
+    _state["ready"] = True
+    if include_disk:
+        with open(READY_MARKER, "w") as f:
+            f.write(str(_state["steps"]))
+    return True
+
+def start_background_warmup():
+    """Start the warm-up once per process in a daemon thread."""
+    with _lock:
+        if _state["started"]:
+            return
+        _state["started"] = True
+
+    # The container may already have warmed the disk caches before Streamlit started
+    include_disk = not os.path.exists(READY_MARKER)
+
+    threading.Thread(target=run_warmup, kwargs={"include_disk": include_disk},
+                     name="warmup", daemon=True).start()
+
+def is_ready():
+    """Return True once the warm-up has finished in this process."""
+    return _state["ready"]
+
+def warmup_status():
+    """Return a copy of the warm-up state for display."""
+    return dict(_state, ready=is_ready())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm up the PDF generator.")
+    parser.add_argument("--check", action="store_true", help="Exit 0 if warm-up has completed")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if os.path.exists(READY_MARKER) else 1)
+
+    logging.basicConfig(level=logging.INFO)
+    if os.path.exists(READY_MARKER):
+        os.remove(READY_MARKER)
+    warm = run_warmup()
+    print(f"Warm-up {'finished' if warm else 'failed'}: {_state['steps']}")
+    # Non-zero keeps `python warmup.py && streamlit run ...` from serving a cold instance
+    raise SystemExit(0 if warm else 1)